@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""asyncio worker-pool helpers shared by the load generators (`benchmark.py`, `load_test.py`)."""
+
+import asyncio
+from typing import Awaitable, Callable
+
+
+def use_eager_tasks() -> bool:
+    """Python 3.12+: new tasks run inline until their first await instead of waiting a loop turn."""
+    factory = getattr(asyncio, "eager_task_factory", None)
+    if factory is None:
+        return False
+    asyncio.get_running_loop().set_task_factory(factory)
+    return True
+
+
+async def run_workers(worker: Callable[[], Awaitable[None]], n_workers: int) -> None:
+    """Run n_workers copies of worker() concurrently; TaskGroup on Python 3.11+, gather before that."""
+    if hasattr(asyncio, "TaskGroup"):
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(n_workers):
+                tg.create_task(worker())
+    else:
+        await asyncio.gather(*(worker() for _ in range(n_workers)))
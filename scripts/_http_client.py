@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Minimal asyncio HTTP/1.x response reader shared by the keep-alive load generators (`ai_demo.py`, `load_test.py`)."""
+
+import asyncio
+
+
+async def read_http_response(reader: asyncio.StreamReader) -> tuple[int, bytes, bool, str]:
+    """Read one HTTP/1.1 response; return (status, body, server_will_close, http_version)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status_parts = lines[0].split(b" ", 2)
+    code = int(status_parts[1]) if len(status_parts) >= 2 else 0
+    version = status_parts[0].decode("ascii", "replace")
+    clen = -1
+    chunked = False
+    close = lines[0].startswith(b"HTTP/1.0")
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            clen = int(value.strip())
+        elif name == b"transfer-encoding":
+            chunked = b"chunked" in value.lower()
+        elif name == b"connection":
+            v = value.lower()
+            if b"close" in v:
+                close = True
+            elif b"keep-alive" in v:
+                close = False
+    if chunked:
+        parts = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            parts.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        return code, b"".join(parts), close, version
+    if clen >= 0:
+        return code, await reader.readexactly(clen), close, version
+    return code, await reader.read(), True, version
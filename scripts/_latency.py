@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Latency percentiles shared by `benchmark.py` and `load_test.py`: P² streaming estimates or exact samples."""
+
+import bisect
+import statistics
+from typing import List, Optional, Tuple
+
+
+class P2Quantile:
+    """
+    P² streaming quantile estimator (Jain & Chlamtac, 1985): five markers, O(1) memory and work per
+    sample. Exact (nearest-rank) until five samples have been seen.
+    """
+
+    __slots__ = ("p", "q", "n", "want", "dn")
+
+    def __init__(self, p: float) -> None:
+        self.p = p
+        self.q: List[float] = []  # marker heights
+        self.n = [0, 1, 2, 3, 4]  # marker positions (0-based)
+        self.want = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]  # desired positions
+        self.dn = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x: float) -> None:
+        q = self.q
+        if len(q) < 5:
+            bisect.insort(q, x)
+            return
+        n = self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x, 1, 4) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        want, dn = self.want, self.dn
+        for i in range(5):
+            want[i] += dn[i]
+        for i in (1, 2, 3):
+            d = want[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                s = 1 if d > 0 else -1
+                qi = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qi < q[i + 1]:
+                    qi = q[i] + s * (q[i + s] - q[i]) / (n[i + s] - n[i])
+                q[i] = qi
+                n[i] += s
+
+    def value(self) -> float:
+        q = self.q
+        if not q:
+            return 0.0
+        if len(q) < 5 or self.n[4] < 5:
+            return q[int(self.p * (len(q) - 1))]
+        return q[2]
+
+
+def exact_points(samples: List[float]) -> Tuple[float, float, float]:
+    """Exact p50/p90/p99: one sort inside statistics.quantiles, interpolated between ranks."""
+    if len(samples) < 2:
+        return samples[0], samples[0], samples[0]
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return q[49], q[89], q[98]
+
+
+class LatencyStats:
+    """
+    Latency summary built while the run progresses: P² estimators for p50/p90/p99 and a running
+    mean, so memory stays O(1) however long the run is. With keep_samples the raw samples are
+    stored instead and the summary is exact.
+    """
+
+    QUANTILES = (0.50, 0.90, 0.99)
+
+    def __init__(self, keep_samples: bool = False) -> None:
+        self.samples: Optional[List[float]] = [] if keep_samples else None
+        self.estimators = tuple(P2Quantile(p) for p in self.QUANTILES)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.sum += ms
+        if self.samples is not None:
+            self.samples.append(ms)
+            return
+        for e in self.estimators:
+            e.add(ms)
+
+    def points(self) -> Optional[Tuple[float, float, float, float]]:
+        """(p50, p90, p99, avg), or None without samples."""
+        if not self.count:
+            return None
+        if self.samples is not None:
+            p50, p90, p99 = exact_points(self.samples)
+        else:
+            p50, p90, p99 = (e.value() for e in self.estimators)
+        return p50, p90, p99, self.sum / self.count
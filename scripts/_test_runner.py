@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Test discovery and running shared by `manage.py test` and `run_tests.py`."""
+
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+
+TEST_MANIFEST = ".test_manifest"
+
+
+def discover_tests(build_dir: Path) -> list[Path]:
+    """
+    Executable test_* files in build_dir. The sorted names are cached in build_dir/.test_manifest and
+    reused while the manifest is newer than the directory (adding/removing/relinking a binary bumps
+    the directory mtime). Strictly newer: timestamps are tick-granular, so equal means unknown.
+    """
+    manifest = build_dir / TEST_MANIFEST
+    try:
+        if manifest.stat().st_mtime_ns > build_dir.stat().st_mtime_ns:
+            return [build_dir / name for name in json.loads(manifest.read_text(encoding="utf-8"))]
+    except (OSError, ValueError):
+        pass
+    # One scandir pass: DirEntry.is_file() answers from the getdents d_type and only stats symlinks
+    # (which are followed, like Path.is_file()).
+    try:
+        with os.scandir(build_dir) as it:
+            tests = sorted(
+                Path(e.path)
+                for e in it
+                if e.name.startswith("test_") and e.is_file() and os.access(e.path, os.X_OK)
+            )
+    except OSError:
+        return []  # no build dir yet
+    if tests:
+        try:
+            # Rewritten in place (no temp file + rename), so refreshing it does not touch the directory mtime.
+            manifest.write_text(json.dumps([t.name for t in tests]), encoding="utf-8")
+        except OSError:
+            pass
+    return tests
+
+
+def limit_cpu(pid: int, seconds: int) -> None:
+    """In-kernel backstop for the wall-clock timeout: SIGXCPU after `seconds` of CPU, SIGKILL a second later."""
+    if seconds <= 0:
+        return
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (seconds, seconds + 1))
+    except (AttributeError, OSError, ValueError):
+        pass  # already exited, no prlimit() on this platform, or above the inherited hard limit
+
+
+def run_tests(tests: list[Path], timeout: int, jobs: int, fail_fast: bool) -> int:
+    """Run test binaries on up to `jobs` threads; return 0, or the first failing exit status (124 on timeout)."""
+    capture = jobs > 1  # keep parallel output per test instead of interleaved
+    # Set by the failing worker itself, so with --fail-fast a queued test never starts after a failure.
+    stop = threading.Event()
+
+    def run_one(t: Path) -> tuple[int | None, bytes | None] | None:
+        if stop.is_set():
+            return None
+        print(f"RUN {t.name}", flush=True)
+        out = subprocess.PIPE if capture else None
+        with subprocess.Popen([str(t)], stdout=out, stderr=subprocess.STDOUT if capture else None) as p:
+            # Limit applied from here rather than a preexec_fn, which would force fork() over vfork() for
+            # every test and is unsafe with the worker threads.
+            limit_cpu(p.pid, timeout)
+            try:
+                output, _ = p.communicate(timeout=timeout)
+                code = None if p.returncode == -signal.SIGXCPU else p.returncode
+            except subprocess.TimeoutExpired as e:
+                # Like subprocess.run(): keep what was read so far and only reap, since a surviving
+                # grandchild could hold the pipe open.
+                p.kill()
+                p.wait()
+                output, code = e.stdout, None
+        if code != 0 and fail_fast:
+            stop.set()
+        return code, output
+
+    failed = 0
+    first_code = 0
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        futures = {ex.submit(run_one, t): t for t in tests}
+        for fut in as_completed(futures):
+            t = futures[fut]
+            res = fut.result()
+            if res is None:
+                continue  # skipped after a --fail-fast failure
+            code, out = res
+            if out:
+                sys.stdout.flush()
+                sys.stdout.buffer.write(out)
+                sys.stdout.flush()
+            if code == 0:
+                continue
+            failed += 1
+            if code is None:
+                print(f"FAIL {t.name} timeout={timeout}s", file=sys.stderr)
+                code = 124  # same status coreutils timeout reported
+            else:
+                print(f"FAIL {t.name} exit={code}", file=sys.stderr)
+            first_code = first_code or code
+    if failed:
+        print(f"FAILED {failed}/{len(tests)}", file=sys.stderr)
+        return first_code
+    print("OK")
+    return 0
+
+
+def run_all(build_dir: Path, timeout: int, parallel: int = 1, fail_fast: bool = False) -> int:
+    """Discover and run every test binary in build_dir (parallel <= 0 = CPU count); returns the exit status."""
+    tests = discover_tests(build_dir)
+    if not tests:
+        print(f"ERROR: no test binaries found in {build_dir}; build first (manage.py build)", file=sys.stderr)
+        return 1
+    jobs = parallel if parallel > 0 else (os.cpu_count() or 1)
+    return run_tests(tests, timeout, jobs, fail_fast)
@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 """
 Minimal ACME v2 client (HTTP-01) using only Python stdlib + openssl CLI.
+If the `cryptography` package is installed, key generation, CSR building and
+RS256 signing run in-process through it instead of forking openssl.
 
 Usage (staging recommended first):
   python3 scripts/acme.py \
@@ -27,28 +29,58 @@ from __future__ import annotations
 
 import argparse
 import base64
+import email.utils
 import hashlib
 import json
 import os
+import shutil
 import subprocess
 import sys
 import time
+import urllib.error
 import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding, rsa
+    from cryptography.x509.oid import NameOID
+except ImportError:  # optional; fall back to the openssl CLI
+    x509 = None
+
+HAVE_CRYPTOGRAPHY = x509 is not None
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
 
 LE_DIR = "https://acme-v02.api.letsencrypt.org/directory"
 LE_STAGING_DIR = "https://acme-staging-v02.api.letsencrypt.org/directory"
+DIRECTORY_CACHE_TTL_S = 24 * 3600
+
+
+def b64url_bytes(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
 
 
 def b64url(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+    return b64url_bytes(data).decode("ascii")
+
+
+if orjson is not None:
+    def json_compact(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+else:
+    def json_compact(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
 
 
 def json_b64url(obj: Any) -> str:
-    return b64url(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return b64url(json_compact(obj))
 
 
 def run(cmd: list[str], input_bytes: Optional[bytes] = None) -> bytes:
@@ -65,39 +97,81 @@ def ensure_openssl() -> None:
         raise SystemExit(f"openssl not available: {e}")
 
 
+def load_private_key(path: Path):
+    return serialization.load_pem_private_key(path.read_bytes(), password=None)
+
+
 def gen_rsa_key(path: Path, bits: int = 2048) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     if path.exists():
         return
+    if HAVE_CRYPTOGRAPHY:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=bits)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        return
     run(["openssl", "genpkey", "-algorithm", "RSA", "-pkeyopt", f"rsa_keygen_bits:{bits}", "-out", str(path)])
     os.chmod(path, 0o600)
 
 
+def _der_tlv(buf: bytes, pos: int) -> Tuple[int, bytes, int]:
+    """Read one DER tag-length-value at pos; return (tag, value, next_pos)."""
+    tag = buf[pos]
+    length = buf[pos + 1]
+    pos += 2
+    if length & 0x80:
+        nbytes = length & 0x7F
+        length = int.from_bytes(buf[pos:pos + nbytes], "big")
+        pos += nbytes
+    end = pos + length
+    if end > len(buf):
+        raise RuntimeError("truncated DER in RSA key")
+    return tag, buf[pos:end], end
+
+
+def rsa_public_from_pem(pem: bytes) -> Tuple[bytes, bytes]:
+    """Extract (modulus, publicExponent) big-endian bytes from an unencrypted PKCS#1 or PKCS#8 RSA PEM."""
+    lines = pem.decode("ascii", "ignore").strip().splitlines()
+    if not lines or not lines[0].startswith("-----BEGIN "):
+        raise RuntimeError("not a PEM private key")
+    label = lines[0]
+    der = base64.b64decode("".join(ln for ln in lines[1:] if not ln.startswith("-----")))
+    _, seq, _ = _der_tlv(der, 0)
+    if "BEGIN PRIVATE KEY" in label:
+        # PKCS#8: SEQUENCE { INTEGER version, SEQUENCE algorithm, OCTET STRING RSAPrivateKey }
+        _, _, pos = _der_tlv(seq, 0)
+        _, _, pos = _der_tlv(seq, pos)
+        tag, inner, _ = _der_tlv(seq, pos)
+        if tag != 0x04:
+            raise RuntimeError("unexpected PKCS#8 layout")
+        _, seq, _ = _der_tlv(inner, 0)
+    elif "BEGIN RSA PRIVATE KEY" not in label:
+        raise RuntimeError(f"unsupported key format: {label}")
+    # PKCS#1 RSAPrivateKey: SEQUENCE { INTEGER version, INTEGER n, INTEGER e, ... }
+    _, _, pos = _der_tlv(seq, 0)
+    tag_n, n, pos = _der_tlv(seq, pos)
+    tag_e, e, _ = _der_tlv(seq, pos)
+    if tag_n != 0x02 or tag_e != 0x02:
+        raise RuntimeError("unexpected RSAPrivateKey layout")
+    return n.lstrip(b"\x00"), e.lstrip(b"\x00")
+
+
 def rsa_jwk_from_key(key_path: Path) -> Dict[str, str]:
-    # modulus hex
-    out = run(["openssl", "rsa", "-in", str(key_path), "-noout", "-modulus"]).decode().strip()
-    # Modulus=ABCDEF...
-    if "Modulus=" not in out:
-        raise RuntimeError("failed to get RSA modulus")
-    mod_hex = out.split("Modulus=")[1].strip()
-    n = b64url(bytes.fromhex(mod_hex))
-
-    # exponent
-    txt = run(["openssl", "rsa", "-in", str(key_path), "-text", "-noout"]).decode("utf-8", "ignore")
-    e_val = 65537
-    for line in txt.splitlines():
-        line = line.strip()
-        if line.startswith("publicExponent:"):
-            # publicExponent: 65537 (0x10001)
-            parts = line.split()
-            if len(parts) >= 2:
-                try:
-                    e_val = int(parts[1])
-                except Exception:
-                    pass
-            break
-    e = b64url(e_val.to_bytes((e_val.bit_length() + 7) // 8, "big"))
-    return {"kty": "RSA", "n": n, "e": e}
+    if HAVE_CRYPTOGRAPHY:
+        pub = load_private_key(key_path).public_key().public_numbers()
+        return {
+            "kty": "RSA",
+            "n": b64url(pub.n.to_bytes((pub.n.bit_length() + 7) // 8, "big")),
+            "e": b64url(pub.e.to_bytes((pub.e.bit_length() + 7) // 8, "big")),
+        }
+    n, e = rsa_public_from_pem(key_path.read_bytes())
+    return {"kty": "RSA", "n": b64url(n), "e": b64url(e)}
 
 
 def jwk_thumbprint(jwk: Dict[str, str]) -> str:
@@ -105,10 +179,54 @@ def jwk_thumbprint(jwk: Dict[str, str]) -> str:
     return b64url(hashlib.sha256(canon).digest())
 
 
+def load_account_jwk(key_path: Path, cache_path: Path) -> Tuple[Dict[str, str], str]:
+    """Return (jwk, thumbprint), reusing cache_path while it is at least as new as key_path."""
+    try:
+        if cache_path.stat().st_mtime_ns >= key_path.stat().st_mtime_ns:
+            j = json.loads(cache_path.read_text(encoding="utf-8"))
+            return j["jwk"], j["thumbprint"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    jwk = rsa_jwk_from_key(key_path)
+    thumb = jwk_thumbprint(jwk)
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    tmp.write_text(json.dumps({"jwk": jwk, "thumbprint": thumb}, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, cache_path)
+    return jwk, thumb
+
+
 def sign_rs256(key_path: Path, data: bytes) -> bytes:
+    if HAVE_CRYPTOGRAPHY:
+        return load_private_key(key_path).sign(data, padding.PKCS1v15(), hashes.SHA256())
     return run(["openssl", "dgst", "-sha256", "-sign", str(key_path)], input_bytes=data)
 
 
+def poll_delay(headers: Dict[str, str], attempt: int, base: float, cap: float) -> float:
+    """Seconds to wait before the next poll: the server's Retry-After if given, else capped exponential backoff."""
+    ra = headers.get("retry-after", "").strip()
+    if ra:
+        try:
+            v = float(ra)
+        except ValueError:
+            try:
+                v = email.utils.parsedate_to_datetime(ra).timestamp() - time.time()
+            except (TypeError, ValueError):
+                v = 0.0
+        if v > 0:
+            return v
+    return min(cap, base * (2 ** attempt))
+
+
+ACME_BAD_NONCE = "urn:ietf:params:acme:error:badNonce"
+
+
+def _acme_error_type(body: bytes) -> str:
+    try:
+        return str(json.loads(body).get("type", ""))
+    except (ValueError, AttributeError):
+        return ""
+
+
 @dataclass
 class AcmeDirectory:
     newNonce: str
@@ -117,21 +235,45 @@ class AcmeDirectory:
 
 
 class AcmeClient:
-    def __init__(self, directory_url: str, account_key: Path, kid_path: Path):
+    def __init__(
+        self,
+        directory_url: str,
+        account_key: Path,
+        kid_path: Path,
+        jwk_cache_path: Optional[Path] = None,
+        directory_cache_path: Optional[Path] = None,
+    ):
         self.directory_url = directory_url
         self.account_key = account_key
         self.kid_path = kid_path
+        self.directory_cache_path = directory_cache_path
         self._dir: Optional[AcmeDirectory] = None
         self._nonce: Optional[str] = None
-        self._jwk = rsa_jwk_from_key(account_key)
-        self._thumb = jwk_thumbprint(self._jwk)
+        # Parsed once and reused for every JWS; None means each signature forks openssl.
+        self._signing_key = load_private_key(account_key) if HAVE_CRYPTOGRAPHY else None
+        if jwk_cache_path is not None:
+            self._jwk, self._thumb = load_account_jwk(account_key, jwk_cache_path)
+        else:
+            self._jwk = rsa_jwk_from_key(account_key)
+            self._thumb = jwk_thumbprint(self._jwk)
 
     def _http(self, req: urllib.request.Request) -> Tuple[int, Dict[str, str], bytes]:
-        with urllib.request.urlopen(req, timeout=15) as r:
-            code = r.getcode()
-            headers = {k.lower(): v for k, v in r.headers.items()}
-            body = r.read()
-            return code, headers, body
+        try:
+            with urllib.request.urlopen(req, timeout=15) as r:
+                code = r.getcode()
+                headers = {k.lower(): v for k, v in r.headers.items()}
+                body = r.read()
+        except urllib.error.HTTPError as e:
+            # Error replies carry a fresh nonce too; keep it before propagating.
+            nonce = e.headers.get("Replay-Nonce") if e.headers else None
+            if nonce:
+                self._nonce = nonce
+            raise
+        # Every ACME response may carry a fresh Replay-Nonce (RFC 8555 7.2); harvest it.
+        nonce = headers.get("replay-nonce")
+        if nonce:
+            self._nonce = nonce
+        return code, headers, body
 
     def _head_nonce(self) -> str:
         assert self._dir is not None
@@ -147,15 +289,46 @@ class AcmeClient:
     def directory(self) -> AcmeDirectory:
         if self._dir is not None:
             return self._dir
-        req = urllib.request.Request(self.directory_url, headers={"Accept": "application/json"})
-        code, _, body = self._http(req)
-        if code != 200:
-            raise RuntimeError(f"directory failed: {code}")
-        j = json.loads(body.decode("utf-8"))
+        j = self._cached_directory()
+        if j is None:
+            req = urllib.request.Request(self.directory_url, headers={"Accept": "application/json"})
+            code, _, body = self._http(req)
+            if code != 200:
+                raise RuntimeError(f"directory failed: {code}")
+            j = json.loads(body)
+            self._store_directory(j)
+        # Nonces are single-use, so this HEAD still happens even when the directory came from cache.
         self._dir = AcmeDirectory(newNonce=j["newNonce"], newAccount=j["newAccount"], newOrder=j["newOrder"])
         self._nonce = self._head_nonce()
         return self._dir
 
+    def _cached_directory(self) -> Optional[Dict[str, Any]]:
+        p = self.directory_cache_path
+        if p is None:
+            return None
+        try:
+            if time.time() - p.stat().st_mtime >= DIRECTORY_CACHE_TTL_S:
+                return None
+            j = json.loads(p.read_text(encoding="utf-8"))
+            if j.get("url") != self.directory_url:
+                return None
+            d = j["directory"]
+            _ = (d["newNonce"], d["newAccount"], d["newOrder"])
+            return d
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def _store_directory(self, d: Dict[str, Any]) -> None:
+        p = self.directory_cache_path
+        if p is None:
+            return
+        try:
+            tmp = p.with_name(p.name + ".tmp")
+            tmp.write_text(json.dumps({"url": self.directory_url, "directory": d}), encoding="utf-8")
+            os.replace(tmp, p)
+        except OSError:
+            pass
+
     def _kid(self) -> Optional[str]:
         if self.kid_path.exists():
             v = self.kid_path.read_text(encoding="utf-8").strip()
@@ -166,9 +339,14 @@ class AcmeClient:
         self.kid_path.parent.mkdir(parents=True, exist_ok=True)
         self.kid_path.write_text(kid + "\n", encoding="utf-8")
 
+    def _sign(self, data: bytes) -> bytes:
+        if self._signing_key is not None:
+            return self._signing_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        return sign_rs256(self.account_key, data)
+
     def _jws(self, url: str, payload: Any, use_kid: bool) -> bytes:
         if self._nonce is None:
-            self._nonce = self._head_nonce()
+            raise RuntimeError("no replay-nonce available (directory() prefetches one)")
         protected: Dict[str, Any] = {"alg": "RS256", "nonce": self._nonce, "url": url}
         if use_kid:
             kid = self._kid()
@@ -178,27 +356,34 @@ class AcmeClient:
         else:
             protected["jwk"] = self._jwk
 
-        p64 = json_b64url(protected)
-        pl64 = "" if payload == "" else json_b64url(payload)
-        signing_input = (p64 + "." + pl64).encode("ascii")
-        sig = b64url(sign_rs256(self.account_key, signing_input))
-        body = json.dumps({"protected": p64, "payload": pl64, "signature": sig}).encode("utf-8")
-        return body
+        p64 = b64url_bytes(json_compact(protected))
+        pl64 = b"" if payload == "" else b64url_bytes(json_compact(payload))
+        signing_input = p64 + b"." + pl64
+        sig = b64url_bytes(self._sign(signing_input))
+        # base64url output never needs JSON escaping, so the flattened JWS is assembled directly.
+        return b'{"protected":"' + p64 + b'","payload":"' + pl64 + b'","signature":"' + sig + b'"}'
 
     def post(self, url: str, payload: Any, use_kid: bool) -> Tuple[int, Dict[str, str], Any]:
-        body = self._jws(url, payload, use_kid=use_kid)
-        req = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/jose+json"})
-        code, headers, resp = self._http(req)
-        self._nonce = headers.get("replay-nonce", self._nonce)
+        for attempt in range(2):
+            body = self._jws(url, payload, use_kid=use_kid)
+            req = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/jose+json"})
+            try:
+                code, headers, resp = self._http(req)
+                break
+            except urllib.error.HTTPError as e:
+                # A stale nonce is answered with badNonce plus a fresh Replay-Nonce; retry once with it.
+                if attempt == 0 and e.code == 400 and _acme_error_type(e.read()) == ACME_BAD_NONCE:
+                    continue
+                raise
         if resp:
-            return code, headers, json.loads(resp.decode("utf-8"))
+            return code, headers, json.loads(resp)
         return code, headers, {}
 
     def get_json(self, url: str) -> Tuple[int, Dict[str, str], Any]:
         req = urllib.request.Request(url, headers={"Accept": "application/json"})
         code, headers, body = self._http(req)
         if body:
-            return code, headers, json.loads(body.decode("utf-8"))
+            return code, headers, json.loads(body)
         return code, headers, {}
 
     def get_pem(self, url: str) -> str:
@@ -226,6 +411,17 @@ class AcmeClient:
 
 
 def build_csr_der(domain_key: Path, domain: str, csr_der: Path) -> bytes:
+    if HAVE_CRYPTOGRAPHY:
+        csr = (
+            x509.CertificateSigningRequestBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, domain)]))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(domain)]), critical=False)
+            .sign(load_private_key(domain_key), hashes.SHA256())
+        )
+        der = csr.public_bytes(serialization.Encoding.DER)
+        csr_der.write_bytes(der)
+        return der
+
     tmp_csr = csr_der.with_suffix(".pem")
     # OpenSSL 1.1.1+: -addext
     try:
@@ -284,11 +480,13 @@ def main() -> int:
     ap.add_argument("--challenge-dir", required=True)
     ap.add_argument("--out-dir", required=True)
     ap.add_argument("--staging", action="store_true")
-    ap.add_argument("--poll-interval", type=float, default=1.0)
+    ap.add_argument("--poll-interval", type=float, default=0.5, help="initial poll backoff seconds (doubled per poll)")
+    ap.add_argument("--poll-max-interval", type=float, default=8.0, help="upper bound for the poll backoff")
     ap.add_argument("--poll-timeout", type=float, default=120.0)
     args = ap.parse_args()
 
-    ensure_openssl()
+    if not HAVE_CRYPTOGRAPHY:
+        ensure_openssl()
     domain = args.domain.strip()
     email = args.email.strip()
     challenge_dir = Path(args.challenge_dir)
@@ -300,9 +498,10 @@ def main() -> int:
 
     account_key = out_dir / "account.key.pem"
     kid_path = out_dir / "account.kid"
+    jwk_path = out_dir / "account.jwk.json"
     gen_rsa_key(account_key, 2048)
 
-    c = AcmeClient(dir_url, account_key, kid_path)
+    c = AcmeClient(dir_url, account_key, kid_path, jwk_cache_path=jwk_path, directory_cache_path=out_dir / "directory.json")
     d = c.directory()
     c.ensure_account(email=email)
 
@@ -336,16 +535,22 @@ def main() -> int:
         # Notify challenge
         c.post(chall["url"], {}, use_kid=True)
 
-        # Poll
+        # Poll (Retry-After if the server sends one, else exponential backoff reset on status change)
         start = time.time()
+        attempt = 0
+        last_st = None
         while time.time() - start < args.poll_timeout:
-            _, _, authz2 = c.get_json(authz_url)
+            _, h2, authz2 = c.get_json(authz_url)
             st = authz2.get("status")
             if st == "valid":
                 break
             if st == "invalid":
                 raise RuntimeError(f"authorization invalid: {authz2}")
-            time.sleep(args.poll_interval)
+            if st != last_st:
+                attempt, last_st = 0, st
+            delay = poll_delay(h2, attempt, args.poll_interval, args.poll_max_interval)
+            time.sleep(max(0.0, min(delay, args.poll_timeout - (time.time() - start))))
+            attempt += 1
         else:
             raise RuntimeError("authorization poll timeout")
 
@@ -360,24 +565,30 @@ def main() -> int:
     # Poll order (POST-as-GET) until certificate URL is available.
     start = time.time()
     cert_url = None
+    attempt = 0
+    last_st = None
     while time.time() - start < args.poll_timeout:
         # POST-as-GET to order URL
-        code, _, oj = c.post(order_url, "", use_kid=True)
-        if code not in (200, 201):
-            time.sleep(args.poll_interval)
-            continue
-        if oj.get("status") == "valid" and oj.get("certificate"):
+        code, oh, oj = c.post(order_url, "", use_kid=True)
+        st = oj.get("status") if code in (200, 201) else None
+        if st == "valid" and oj.get("certificate"):
             cert_url = oj["certificate"]
             break
-        if oj.get("status") == "invalid":
+        if st == "invalid":
             raise RuntimeError(f"order invalid: {oj}")
-        time.sleep(args.poll_interval)
+        if st != last_st:
+            attempt, last_st = 0, st
+        delay = poll_delay(oh, attempt, args.poll_interval, args.poll_max_interval)
+        time.sleep(max(0.0, min(delay, args.poll_timeout - (time.time() - start))))
+        attempt += 1
     if not cert_url:
         raise RuntimeError("order poll timeout (certificate url not available)")
 
     pem = c.get_pem(cert_url)
     (out_dir / "fullchain.pem").write_text(pem, encoding="utf-8")
-    (out_dir / "privkey.pem").write_text(domain_key.read_text(encoding="utf-8"), encoding="utf-8")
+    # copyfile uses the kernel's in-place copy (copy_file_range/sendfile) on Linux.
+    shutil.copyfile(domain_key, out_dir / "privkey.pem")
+    os.chmod(out_dir / "privkey.pem", 0o600)
 
     print("OK")
     print(f"fullchain: {out_dir / 'fullchain.pem'}")
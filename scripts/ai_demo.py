@@ -2,49 +2,93 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import atexit
+import http.client
+import itertools
 import json
 import os
 import random
+import re
 import shutil
 import signal
 import subprocess
 import sys
 import threading
 import time
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from _http_client import read_http_response
+
+try:
+    import uvloop
+except ImportError:  # optional; the default asyncio loop is used otherwise
+    uvloop = None
+
+
+# Small fixed /infer payload (work_ms dominates); built once instead of per request.
+INFER_BODY = b'{"x":' + b"1" * 2000 + b"}"
+
+_tls = threading.local()
+
+
+def _pooled_conn(host: str, port: int, timeout: float) -> http.client.HTTPConnection:
+    # One keep-alive connection per (thread, host:port); executor threads live for the whole run,
+    # so each worker reuses its socket instead of paying a TCP handshake per request.
+    conns = getattr(_tls, "conns", None)
+    if conns is None:
+        conns = _tls.conns = {}
+    conn = conns.get((host, port))
+    if conn is None:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conns[(host, port)] = conn
+    return conn
+
+
+def http_request(url: str, method: str = "GET", body: bytes | None = None, headers: dict | None = None, timeout: float = 2.0) -> bytes:
+    u = urlsplit(url)
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    conn = _pooled_conn(u.hostname or "127.0.0.1", u.port or 80, timeout)
+    for attempt in range(2):
+        reused = conn.sock is not None
+        if reused:
+            conn.sock.settimeout(timeout)
+        else:
+            conn.timeout = timeout
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            r = conn.getresponse()
+            data = r.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            conn.close()
+            if reused and attempt == 0:
+                # Peer dropped an idle keep-alive connection; retry once on a fresh socket.
+                continue
+            raise
+        except Exception:
+            conn.close()
+            raise
+        if r.status >= 400:
+            raise RuntimeError(f"{method} {url}: HTTP {r.status}")
+        return data
+    raise RuntimeError(f"{method} {url}: connection lost")
 
 
 def http_json(url: str, method: str = "GET", body: bytes | None = None, headers: dict | None = None, timeout: float = 2.0):
-    req = urllib.request.Request(url, method=method)
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
-    if body is not None:
-        req.data = body
-    with urllib.request.urlopen(req, timeout=timeout) as r:
-        data = r.read()
-    return json.loads(data.decode("utf-8"))
+    return json.loads(http_request(url, method=method, body=body, headers=headers, timeout=timeout).decode("utf-8"))
 
 
 def http_text(url: str, method: str = "GET", body: bytes | None = None, headers: dict | None = None, timeout: float = 2.0) -> str:
-    req = urllib.request.Request(url, method=method)
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
-    if body is not None:
-        req.data = body
-    with urllib.request.urlopen(req, timeout=timeout) as r:
-        data = r.read()
-    return data.decode("utf-8", errors="replace")
+    return http_request(url, method=method, body=body, headers=headers, timeout=timeout).decode("utf-8", errors="replace")
 
 def wait_http_ok(url: str, timeout_sec: float = 10.0):
     end = time.time() + timeout_sec
     last_err = None
     while time.time() < end:
         try:
-            _ = urllib.request.urlopen(url, timeout=1.0).read(1)
+            _ = http_request(url, timeout=1.0)
             return True
         except Exception as e:  # noqa: BLE001
             last_err = e
@@ -52,6 +96,29 @@ def wait_http_ok(url: str, timeout_sec: float = 10.0):
     raise RuntimeError(f"wait_http_ok timeout: {url}: {last_err}")
 
 
+def percentiles(samples: list[float], ps) -> list[float]:
+    # Sorts samples in place (no copy) once for every requested rank (nearest-rank on the sorted samples).
+    if not samples:
+        return [0.0 for _ in ps]
+    samples.sort()
+    last = len(samples) - 1
+    return [samples[int(p * last)] for p in ps]
+
+
+_GLOBAL_SECTION_RE = re.compile(r"(?ms)^[ \t]*\[global\][ \t]*$.*?(?=^[ \t]*\[|\Z)")
+
+
+def patch_global_section(cfg_text: str, overrides: dict[str, str]) -> str:
+    # Rewrite `key = ...` lines inside [global] only; other sections may reuse the same key names.
+    m = _GLOBAL_SECTION_RE.search(cfg_text)
+    if m is None:
+        return cfg_text
+    section = m.group(0)
+    for key, value in overrides.items():
+        section = re.sub(rf"(?m)^[ \t]*{re.escape(key)}\b.*$", lambda _m, k=key, v=value: f"{k} = {v}", section)
+    return cfg_text[: m.start()] + section + cfg_text[m.end():]
+
+
 def kill_proc(p: subprocess.Popen, name: str):
     if p.poll() is not None:
         return
@@ -95,23 +162,12 @@ def main():
     cfg_path = os.path.abspath(os.path.join(root, args.proxy_config))
     if not os.path.exists(cfg_path):
         raise SystemExit(f"proxy config not found: {cfg_path}")
-    cfg_text = open(cfg_path, "r", encoding="utf-8").read().splitlines()
-    out_lines: list[str] = []
-    in_global = False
-    for line in cfg_text:
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            in_global = (s == "[global]")
-        if in_global and s.startswith("listen_port"):
-            out_lines.append(f"listen_port = {args.proxy_port}")
-            continue
-        if in_global and s.startswith("strategy"):
-            out_lines.append(f"strategy = {args.strategy}")
-            continue
-        out_lines.append(line)
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg_text = f.read()
+    cfg_text = patch_global_section(cfg_text, {"listen_port": str(args.proxy_port), "strategy": args.strategy})
     run_cfg_path = os.path.join(root, "config", f"ai_demo.run.{os.getpid()}.conf")
     with open(run_cfg_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(out_lines) + "\n")
+        f.write(cfg_text if cfg_text.endswith("\n") else cfg_text + "\n")
 
     procs: list[subprocess.Popen] = []
 
@@ -125,7 +181,9 @@ def main():
 
     atexit.register(cleanup)
 
-    # Start backends.
+    # Start backends. close_fds=False (plus absolute executable, no cwd/env/preexec_fn) lets
+    # subprocess use posix_spawn instead of fork+exec; Python-created fds are non-inheritable
+    # (PEP 446), so the children still see only stdio.
     models = ["llama", "qwen", "gemma", "mixtral"]
     for i in range(args.backend_count):
         port = args.backend_port_base + i + 1
@@ -138,30 +196,39 @@ def main():
             [sys.executable, back_bin, "--port", str(port), "--id", backend_id, "--model", model, "--version", version, "--loaded", str(loaded), "--capacity", str(capacity)],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
+            close_fds=False,
         )
         procs.append(p)
 
     # Start proxy.
-    proxy_out = open(os.path.join(root, "logs", f"ai_demo_proxy.{os.getpid()}.out"), "wb")
     os.makedirs(os.path.join(root, "logs"), exist_ok=True)
+    proxy_out = open(os.path.join(root, "logs", f"ai_demo_proxy.{os.getpid()}.out"), "wb")
     proxy = subprocess.Popen([os.path.abspath(os.path.join(root, args.proxy_bin)), "-c", run_cfg_path], stdout=proxy_out, stderr=proxy_out)
     procs.append(proxy)
 
     # Wait ready.
     wait_http_ok(f"http://127.0.0.1:{args.proxy_port}/stats", timeout_sec=15.0)
 
-    # Register backends via admin API.
-    for i in range(args.backend_count):
-        port = args.backend_port_base + i + 1
-        body = json.dumps({"ip": "127.0.0.1", "port": port, "weight": 1}).encode("utf-8")
-        _ = http_text(
-            f"http://127.0.0.1:{args.proxy_port}/admin/backend_register",
+    # Register backends via admin API. The admin endpoint closes the connection after each
+    # reply, so issue the registrations concurrently instead of one round trip at a time.
+    register_url = f"http://127.0.0.1:{args.proxy_port}/admin/backend_register"
+    register_body = b'{"ip":"127.0.0.1","port":%d,"weight":1}'
+
+    def register_one(port: int) -> str:
+        return http_text(
+            register_url,
             method="POST",
-            body=body,
+            body=register_body % port,
             headers={"Content-Type": "application/json"},
             timeout=2.0,
         )
 
+    if args.backend_count > 0:
+        with ThreadPoolExecutor(max_workers=min(32, args.backend_count)) as ex:
+            reg_futures = [ex.submit(register_one, args.backend_port_base + i + 1) for i in range(args.backend_count)]
+            for f in as_completed(reg_futures):
+                _ = f.result()
+
     print("已启动演示环境：")
     print(f"- Proxy: http://127.0.0.1:{args.proxy_port}/dashboard")
     print(f"- History: http://127.0.0.1:{args.proxy_port}/history_ui")
@@ -170,61 +237,72 @@ def main():
     print(f"- Backends: {args.backend_count} (ports {args.backend_port_base+1}..{args.backend_port_base+args.backend_count})")
     print("")
 
-    stop_flag = threading.Event()
+    # Draw the per-request model sequence once up front instead of calling random.choice per request.
+    model_seq = random.choices(models, k=65536)
+    infer_path = f"/infer?work_ms={args.work_ms}"
 
-    def worker_one(req_id: int):
-        model = random.choice(models)
-        url = f"http://127.0.0.1:{args.proxy_port}/infer?work_ms={args.work_ms}"
-        headers = {"X-Request-Id": str(req_id), "Content-Type": "application/json"}
-        if args.mode == "model_affinity":
-            headers["X-Model"] = model
-        body = (b"{" + b"\"x\":" + (b"1" * 2000) + b"}")  # small payload; work_ms dominates
-        t0 = time.time()
-        j = http_json(url, method="POST", body=body, headers=headers, timeout=10.0)
-        dt = (time.time() - t0) * 1000.0
-        return j.get("backend", "-"), dt, (model if args.mode == "model_affinity" else "")
+    def build_request(req_id: int) -> tuple[bytes, str]:
+        model = model_seq[req_id % len(model_seq)]
+        head = (
+            f"POST {infer_path} HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{args.proxy_port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"X-Request-Id: {req_id}\r\n"
+            + (f"X-Model: {model}\r\n" if args.mode == "model_affinity" else "")
+            + f"Content-Length: {len(INFER_BODY)}\r\n\r\n"
+        ).encode("ascii")
+        return head + INFER_BODY, (model if args.mode == "model_affinity" else "")
 
     # Fire a burst of requests.
     end = time.time() + args.duration
     total = 0
-    by_backend: dict[str, int] = {}
-    by_model: dict[str, int] = {}
+    by_backend: Counter[str] = Counter()
+    by_model: Counter[str] = Counter()
     lats: list[float] = []
+    req_ids = itertools.count(1)
 
-    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as ex:
-        futures = []
-        req_id = 0
+    async def load_worker() -> None:
+        # One event-loop coroutine per concurrency slot, each owning a keep-alive connection.
+        nonlocal total
+        conn: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
         while time.time() < end:
-            # keep the pipeline full
-            while len(futures) < args.concurrency and time.time() < end:
-                req_id += 1
-                futures.append(ex.submit(worker_one, req_id))
-            done = []
+            req, model = build_request(next(req_ids))
+            t0 = time.time()
             try:
-                for f in as_completed(futures, timeout=0.2):
-                    done.append(f)
-                    try:
-                        backend, dt, model = f.result()
-                        total += 1
-                        by_backend[backend] = by_backend.get(backend, 0) + 1
-                        by_model[model] = by_model.get(model, 0) + 1
-                        lats.append(dt)
-                    except Exception:
-                        pass
-            except FuturesTimeoutError:
-                # no futures completed within this short window; continue filling/polling
-                pass
-            if done:
-                done_set = set(done)
-                futures = [x for x in futures if x not in done_set]
-
-    if lats:
-        lats.sort()
-        p50 = lats[int(0.50 * (len(lats) - 1))]
-        p90 = lats[int(0.90 * (len(lats) - 1))]
-        p99 = lats[int(0.99 * (len(lats) - 1))]
-    else:
-        p50 = p90 = p99 = 0.0
+                if conn is None:
+                    conn = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", args.proxy_port), timeout=10.0)
+                reader, writer = conn
+                writer.write(req)
+                code, data, close, _ = await asyncio.wait_for(read_http_response(reader), timeout=10.0)
+                if close:
+                    writer.close()
+                    conn = None
+                if code >= 400:
+                    continue
+                j = json.loads(data)
+                if not isinstance(j, dict):
+                    continue  # valid JSON but not an object: failed like an HTTP error, connection still usable
+            except Exception:
+                if conn is not None:
+                    conn[1].close()
+                    conn = None
+                continue
+            dt = (time.time() - t0) * 1000.0
+            total += 1
+            by_backend[j.get("backend", "-")] += 1
+            by_model[model] += 1
+            lats.append(dt)
+        if conn is not None:
+            conn[1].close()
+
+    async def drive() -> None:
+        await asyncio.gather(*(load_worker() for _ in range(max(1, args.concurrency))))
+
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(drive())
+
+    p50, p90, p99 = percentiles(lats, (0.50, 0.90, 0.99))
 
     print(f"压测完成：total={total} concurrency={args.concurrency} work_ms={args.work_ms}")
     print(f"延迟(ms)：p50={p50:.1f} p90={p90:.1f} p99={p99:.1f}")
@@ -3,37 +3,96 @@
 
 import argparse
 import asyncio
+import functools
+import hashlib
+import itertools
 import json
 import os
+import platform
+import re
 import shutil
+import resource
 import signal
 import socket
+import ssl
 import subprocess
 import sys
+import tarfile
 import tempfile
 import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+try:
+    import uvloop
+except ImportError:  # optional; the default asyncio loop is used otherwise
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+
+_BACKEND_IDLE_TIMEOUT_S = 30.0
+_LISTEN_BACKLOG = 4096  # asyncio defaults to 100, which overflows when many clients connect at once
+
+# Backend payloads are built once: /download bodies are memoryview slices of one shared buffer.
+_DOWNLOAD_MAX = 8 * 1024 * 1024
+_DOWNLOAD_BODY = b"a" * _DOWNLOAD_MAX
+_DOWNLOAD_VIEW = memoryview(_DOWNLOAD_BODY)
+_OK_BODY = b"OK"
+# Bodies at least this large go out via sendfile(2) from an in-memory file instead of the user-space buffer.
+_SENDFILE_MIN = 64 * 1024
+_sendfile_ok = True
+
+
+@functools.lru_cache(maxsize=1)
+def _download_file():
+    """memfd holding the download payload (None when memfd_create is unavailable)."""
+    if not hasattr(os, "memfd_create"):
+        return None
+    try:
+        f = open(os.memfd_create("bench_download"), "r+b", buffering=0)
+    except OSError:
+        return None
+    f.write(_DOWNLOAD_BODY)
+    return f
+
+
+@functools.lru_cache(maxsize=64)
+def _resp_header(content_length: int, close: bool) -> bytes:
+    return (
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: application/octet-stream\r\n"
+        + f"Content-Length: {content_length}\r\n".encode("ascii")
+        + (b"Connection: close\r\n" if close else b"Connection: keep-alive\r\n")
+        + b"\r\n"
+    )
+
 
 @dataclass
 class LatResult:
     ok: int
     failed: int
-    lat_ms: List[float]
+    lat_ns: List[int]  # per-request latencies in integer nanoseconds (ok requests only)
     elapsed_s: float
     bytes_total: int
     total: int
 
 
-def _reserve_free_port() -> int:
+def _reserve_free_socket() -> Tuple[socket.socket, int]:
+    """
+    Bind an SO_REUSEPORT socket on a free loopback port and keep it open.
+    The caller either listens on it directly or holds it until a child has bound the same port
+    (children set SO_REUSEPORT too), so the port cannot be taken in between.
+    """
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     s.bind(("127.0.0.1", 0))
-    port = s.getsockname()[1]
-    s.close()
-    return port
+    return s, s.getsockname()[1]
 
 
 async def _wait_tcp(host: str, port: int, timeout_s: float) -> None:
@@ -52,93 +111,168 @@ async def _wait_tcp(host: str, port: int, timeout_s: float) -> None:
     raise TimeoutError(f"port not ready: {host}:{port}")
 
 
-async def _backend_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
-    try:
-        data = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=2.0)
-    except Exception:
-        writer.close()
+def _set_nodelay(writer: asyncio.StreamWriter) -> None:
+    sock = writer.get_extra_info("socket")
+    if sock is None:
         return
-    head = data.decode("latin1", errors="ignore")
-    # First line: METHOD PATH HTTP/1.1
-    first = head.split("\r\n", 1)[0]
-    parts = first.split(" ")
-    path = parts[1] if len(parts) >= 2 else "/"
-
-    body = b"OK"
-    if path.startswith("/download"):
-        # /download?bytes=N
-        n = 1024
-        if "?" in path:
-            _, q = path.split("?", 1)
-            for kv in q.split("&"):
-                if kv.startswith("bytes="):
-                    try:
-                        n = int(kv.split("=", 1)[1])
-                    except Exception:
-                        n = 1024
-        if n < 0:
-            n = 0
-        if n > 8 * 1024 * 1024:
-            n = 8 * 1024 * 1024
-        body = b"a" * n
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
 
-    resp = (
-        b"HTTP/1.1 200 OK\r\n"
-        b"Content-Type: application/octet-stream\r\n"
-        + f"Content-Length: {len(body)}\r\n".encode("ascii")
-        + b"Connection: close\r\n"
-        + b"\r\n"
-        + body
-    )
+
+async def _sendfile_body(writer: asyncio.StreamWriter, header: bytes, n: int) -> bool:
+    """Write `header` then `n` payload bytes with loop.sendfile; False (nothing written) if unavailable."""
+    global _sendfile_ok
+    f = _download_file() if _sendfile_ok else None
+    if f is None:
+        return False
+    writer.write(header)
     try:
-        writer.write(resp)
+        await asyncio.get_running_loop().sendfile(writer.transport, f, 0, n, fallback=False)
+    except (asyncio.SendfileNotAvailableError, NotImplementedError):
+        # e.g. uvloop or a transport without native sendfile; stop trying and send from memory.
+        _sendfile_ok = False
+        writer.write(_DOWNLOAD_VIEW[:n])
         await writer.drain()
-    except Exception:
-        pass
-    writer.close()
+    return True
+
+
+async def _backend_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # HTTP/1.1 keep-alive: serve requests on this connection until the peer closes,
+    # asks for Connection: close, or stays idle past the keep-alive timeout.
+    _set_nodelay(writer)
     try:
-        await writer.wait_closed()
-    except Exception:
-        pass
+        while True:
+            try:
+                data = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=_BACKEND_IDLE_TIMEOUT_S)
+            except (asyncio.CancelledError, Exception):
+                # Idle keep-alive connections are cancelled at loop teardown; end quietly
+                # (Python 3.11's stream callback logs cancelled handler tasks as errors).
+                return
+            # Request line "METHOD PATH HTTP/1.1", parsed on bytes (no str decode/split).
+            line_end = data.find(b"\r\n")
+            sp1 = data.find(b" ", 0, line_end)
+            sp2 = data.find(b" ", sp1 + 1, line_end) if sp1 >= 0 else -1
+            if sp1 < 0:
+                sp1, sp2 = 0, 0
+            elif sp2 < 0:
+                sp2 = line_end
+            close = b"\r\nconnection: close" in data.lower()
+
+            body = _OK_BODY
+            if data.startswith(b"/download", sp1 + 1, sp2):
+                # /download?bytes=N
+                n = 1024
+                start = data.find(b"bytes=", sp1 + 1, sp2)
+                if start >= 0:
+                    start += 6
+                    end = data.find(b"&", start, sp2)
+                    try:
+                        n = int(data[start : end if end >= 0 else sp2])
+                    except ValueError:
+                        n = 1024
+                if n < 0:
+                    n = 0
+                if n > _DOWNLOAD_MAX:
+                    n = _DOWNLOAD_MAX
+                body = _DOWNLOAD_VIEW[:n]  # zero-copy slice of the shared payload
 
+            try:
+                header = _resp_header(len(body), close)
+                if len(body) < _SENDFILE_MIN or not await _sendfile_body(writer, header, len(body)):
+                    writer.writelines((header, body))
+                    await writer.drain()
+            except Exception:
+                return
+            if close:
+                return
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (asyncio.CancelledError, Exception):
+            pass  # same teardown cancellation as the idle read above
 
-async def _one_http(host: str, port: int, path: str, timeout_s: float) -> Tuple[float, int]:
-    req = (
+
+def _http_get_req(path: str) -> bytes:
+    return (
         f"GET {path} HTTP/1.1\r\n"
         f"Host: bench.local\r\n"
-        f"Connection: close\r\n"
+        f"Connection: keep-alive\r\n"
         f"\r\n"
     ).encode("ascii")
-    t0 = time.perf_counter()
-    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=timeout_s)
-    writer.write(req)
-    await writer.drain()
-
-    header = b""
-    while b"\r\n\r\n" not in header:
-        chunk = await asyncio.wait_for(reader.read(65536), timeout=timeout_s)
-        if not chunk:
-            break
-        header += chunk
-        if len(header) > 256 * 1024:
-            break
-
-    body_bytes = 0
-    if b"\r\n\r\n" in header:
-        _, rest = header.split(b"\r\n\r\n", 1)
-        body_bytes += len(rest)
-    while True:
-        chunk = await asyncio.wait_for(reader.read(65536), timeout=timeout_s)
-        if not chunk:
-            break
-        body_bytes += len(chunk)
-
-    writer.close()
-    try:
-        await writer.wait_closed()
-    except Exception:
-        pass
-    return (time.perf_counter() - t0) * 1000.0, body_bytes
+
+
+def _scan_head(head: bytes) -> Tuple[Optional[int], bool]:
+    """(Content-Length or None, Connection: close) from a raw response head, via find() on one lowered copy."""
+    low = head.lower()
+    clen: Optional[int] = None
+    i = low.find(b"\r\ncontent-length:")
+    if i >= 0:
+        i += 17
+        clen = int(head[i : head.find(b"\r\n", i)])  # int() strips surrounding whitespace
+    return clen, b"\r\nconnection: close" in low
+
+
+class _KeepAliveConn:
+    """One persistent HTTP/1.1 connection owned by a single load worker."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def close(self) -> None:
+        w = self.writer
+        self.reader = self.writer = None
+        if w is not None:
+            w.close()
+            try:
+                await w.wait_closed()
+            except Exception:
+                pass
+
+    async def request(self, req: bytes, timeout_s: float) -> Tuple[float, int]:
+        """Send one request; return (latency_ns, body_bytes). Reconnects lazily; closes on error."""
+        t0 = time.perf_counter_ns()
+        try:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), timeout=timeout_s
+                )
+                _set_nodelay(self.writer)
+            reader, writer = self.reader, self.writer
+            writer.write(req)
+            await writer.drain()
+
+            # readuntil leaves any body bytes buffered in the reader; the header is bounded by
+            # the stream limit (64 KiB), so no manual accumulation or size check is needed.
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=timeout_s)
+            clen, close = _scan_head(head)
+            body_bytes = 0
+            if clen is None:
+                # No length: body is delimited by EOF, so this connection cannot be reused.
+                while True:
+                    chunk = await asyncio.wait_for(reader.read(65536), timeout=timeout_s)
+                    if not chunk:
+                        break
+                    body_bytes += len(chunk)
+                await self.close()
+            else:
+                # Count the body off the stream without materializing it.
+                while body_bytes < clen:
+                    chunk = await asyncio.wait_for(reader.read(min(65536, clen - body_bytes)), timeout=timeout_s)
+                    if not chunk:
+                        raise ConnectionError("connection closed mid-body")
+                    body_bytes += len(chunk)
+                if close:
+                    await self.close()
+        except BaseException:
+            await self.close()
+            raise
+        return time.perf_counter_ns() - t0, body_bytes
 
 
 async def _run_load(
@@ -150,99 +284,286 @@ async def _run_load(
     timeout_s: float,
     progress_interval_s: float,
 ) -> LatResult:
-    sem = asyncio.Semaphore(concurrency)
-    lat_ms: List[float] = []
+    # Preallocated slots (no list regrowth); trimmed to `ok` entries at the end.
+    lat_ns = [0] * max(0, total)
     ok = 0
     failed = 0
     bytes_total = 0
+    done = 0
     start = time.perf_counter()
-    last_report = start
+    # Fixed pool of `concurrency` workers pulling request slots from a shared counter,
+    # instead of `total` pre-created tasks gated by a semaphore.
+    slots = itertools.count()
+    req = _http_get_req(path)
 
-    async def job() -> None:
-        nonlocal ok, failed, bytes_total
-        async with sem:
+    async def worker() -> None:
+        conn = _KeepAliveConn(host, port)
+        try:
+            await worker_loop(conn)
+        finally:
+            await conn.close()
+
+    async def worker_loop(conn: _KeepAliveConn) -> None:
+        nonlocal ok, failed, bytes_total, done
+        while next(slots) < total:
             try:
-                ms, n = await _one_http(host, port, path, timeout_s)
-                lat_ms.append(ms)
+                ns, n = await conn.request(req, timeout_s)
+                lat_ns[ok] = ns
                 bytes_total += n
                 ok += 1
             except Exception:
                 failed += 1
+            done += 1
 
-    tasks = [asyncio.create_task(job()) for _ in range(total)]
-    done = 0
-    for fut in asyncio.as_completed(tasks):
-        await fut
-        done += 1
-        now = time.perf_counter()
-        if progress_interval_s > 0 and now - last_report >= progress_interval_s:
-            elapsed = now - start
+    async def progress_printer(stop: asyncio.Event) -> None:
+        # One wakeup per interval instead of per-request bookkeeping in the workers.
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=progress_interval_s)
+                return
+            except asyncio.TimeoutError:
+                pass
+            elapsed = time.perf_counter() - start
             rate = done / elapsed if elapsed > 0 else 0.0
             eta = (total - done) / rate if rate > 0 else 0.0
             pct = (done * 100.0) / total if total > 0 else 100.0
             print(
-                f"[progress] {path} {done}/{total} ({pct:.1f}%) "
+                f"[progress] {host}:{port}{path} {done}/{total} ({pct:.1f}%) "
                 f"elapsed={elapsed:.1f}s eta={eta:.1f}s rate={rate:.1f} req/s",
                 file=sys.stderr,
                 flush=True,
             )
-            last_report = now
+
+    stop = asyncio.Event()
+    printer = asyncio.create_task(progress_printer(stop)) if progress_interval_s > 0 else None
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+    finally:
+        stop.set()
+        if printer is not None:
+            await printer
     elapsed_s = time.perf_counter() - start
-    return LatResult(ok=ok, failed=failed, lat_ms=lat_ms, elapsed_s=elapsed_s, bytes_total=bytes_total, total=total)
+    del lat_ns[ok:]
+    return LatResult(ok=ok, failed=failed, lat_ns=lat_ns, elapsed_s=elapsed_s, bytes_total=bytes_total, total=total)
 
 
-def _pct(lat_ms: List[float], p: float) -> float:
-    if not lat_ms:
-        return 0.0
-    arr = sorted(lat_ms)
-    idx = int(p * (len(arr) - 1))
-    return float(arr[idx])
+def _pcts(samples: List[int], ps: Tuple[float, ...]) -> List[int]:
+    # One in-place sort shared by all requested percentiles (sorts samples; callers are done with order).
+    # list.sort() is C timsort with an int fast path, which beats a Python-level quickselect at these sizes.
+    if not samples:
+        return [0 for _ in ps]
+    samples.sort()
+    last = len(samples) - 1
+    return [samples[int(p * last)] for p in ps]
 
 
 def _summary(r: LatResult) -> Dict[str, float]:
+    p50, p90, p99 = (ns / 1e6 for ns in _pcts(r.lat_ns, (0.50, 0.90, 0.99)))
     return {
         "ok": r.ok,
         "failed": r.failed,
         "elapsed_s": float(f"{r.elapsed_s:.6f}"),
         "qps": float(f"{(r.ok / r.elapsed_s) if r.elapsed_s > 0 else 0.0:.6f}"),
-        "p50_ms": float(f"{_pct(r.lat_ms, 0.50):.6f}"),
-        "p90_ms": float(f"{_pct(r.lat_ms, 0.90):.6f}"),
-        "p99_ms": float(f"{_pct(r.lat_ms, 0.99):.6f}"),
+        "p50_ms": float(f"{p50:.6f}"),
+        "p90_ms": float(f"{p90:.6f}"),
+        "p99_ms": float(f"{p99:.6f}"),
         "bytes_total": r.bytes_total,
         "total": r.total,
     }
 
 
+_WRK_LAT_UNITS = {"us": 1e-3, "ms": 1.0, "s": 1e3, "m": 60e3, "h": 3600e3}
+_WRK_SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+
+def _wrk_ms(tok: str) -> float:
+    m = re.fullmatch(r"([0-9.]+)([a-z]+)", tok)
+    if not m or m.group(2) not in _WRK_LAT_UNITS:
+        raise ValueError(f"bad wrk latency: {tok!r}")
+    return float(m.group(1)) * _WRK_LAT_UNITS[m.group(2)]
+
+
+def _parse_wrk(text: str, duration_s: float) -> Dict[str, float]:
+    pcts: Dict[str, float] = {}
+    for m in re.finditer(r"^\s*(50|90|99)(?:\.0+)?%\s+(\S+)\s*$", text, re.M):
+        pcts[m.group(1)] = _wrk_ms(m.group(2))
+    m = re.search(r"^\s*(\d+) requests in ([0-9.]+)(\w+), ([0-9.]+)(\w+) read", text, re.M)
+    if not m:
+        raise RuntimeError(f"unexpected wrk output:\n{text}")
+    requests = int(m.group(1))
+    elapsed_s = _wrk_ms(m.group(2) + m.group(3)) / 1e3
+    bytes_total = int(float(m.group(4)) * _WRK_SIZE_UNITS.get(m.group(5), 1))
+    failed = 0
+    se = re.search(r"Socket errors: connect (\d+), read (\d+), write (\d+), timeout (\d+)", text)
+    if se:
+        failed += sum(int(x) for x in se.groups())
+    non2xx = re.search(r"Non-2xx or 3xx responses: (\d+)", text)
+    if non2xx:
+        failed += int(non2xx.group(1))
+    ok = max(0, requests - failed)
+    if elapsed_s <= 0:
+        elapsed_s = duration_s
+    return {
+        "ok": ok,
+        "failed": failed,
+        "elapsed_s": float(f"{elapsed_s:.6f}"),
+        "qps": float(f"{(ok / elapsed_s) if elapsed_s > 0 else 0.0:.6f}"),
+        "p50_ms": float(f"{pcts.get('50', 0.0):.6f}"),
+        "p90_ms": float(f"{pcts.get('90', 0.0):.6f}"),
+        "p99_ms": float(f"{pcts.get('99', 0.0):.6f}"),
+        "bytes_total": bytes_total,
+        "total": requests,
+    }
+
+
+async def _run_load_wrk(
+    wrk_bin: str,
+    host: str,
+    port: int,
+    path: str,
+    concurrency: int,
+    duration_s: float,
+    timeout_s: float,
+    cpus: Optional[List[int]] = None,
+) -> Dict[str, float]:
+    """Drive the load with wrk (native, duration-based); return a `_summary`-shaped dict."""
+    conns = max(1, concurrency)
+    threads = max(1, min(len(cpus) if cpus else (os.cpu_count() or 1), conns))
+    cmd = _taskset_prefix(cpus) + [
+        wrk_bin,
+        f"-t{threads}",
+        f"-c{conns}",
+        f"-d{max(1, int(round(duration_s)))}s",
+        f"--timeout={max(1, int(round(timeout_s)))}s",
+        "--latency",
+        f"http://{host}:{port}{path}",
+    ]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+    )
+    out, _ = await proc.communicate()
+    text = out.decode("utf-8", errors="replace")
+    if proc.returncode != 0:
+        raise RuntimeError(f"wrk failed (exit {proc.returncode}):\n{text}")
+    return _parse_wrk(text, duration_s)
+
+
+def _cpu_split() -> Optional[Dict[str, List[int]]]:
+    """Split this process's allowed CPUs into disjoint proxy / haproxy / client sets (None if < 3 CPUs)."""
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return None
+    third = len(cpus) // 3
+    if third == 0:
+        return None
+    return {
+        "proxy": cpus[:third],
+        "haproxy": cpus[third : 2 * third],
+        # The backend runs in-process with the client, so both share the remainder.
+        "client": cpus[2 * third :],
+    }
+
+
+def _taskset_prefix(cpus: Optional[List[int]]) -> List[str]:
+    if not cpus:
+        return []
+    return ["taskset", "-c", ",".join(str(c) for c in cpus)]
+
+
+def _results_json(obj: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
 def _run(cmd: List[str], timeout_s: int, cwd: Optional[Path] = None) -> None:
     subprocess.check_call(cmd, cwd=str(cwd) if cwd else None, timeout=timeout_s)
 
 
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _tarball_ok(tar: Path, tar_sum: Path) -> bool:
+    """True if `tar` matches its recorded sha256; a tarball without a record is read once and then recorded."""
+    if not tar.exists():
+        return False
+    digest = _sha256_file(tar)
+    if tar_sum.exists():
+        return tar_sum.read_text().strip() == digest
+    try:
+        with tarfile.open(tar, "r:gz") as tf:
+            tf.getmembers()  # reads to the end, so gzip CRC/truncation errors surface here
+    except (tarfile.TarError, OSError, EOFError):
+        return False
+    tar_sum.write_text(digest + "\n")
+    return True
+
+
+def _haproxy_reports_version(bin_path: Path, version: str) -> bool:
+    try:
+        r = subprocess.run([str(bin_path), "-v"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return r.returncode == 0 and f"version {version}" in r.stdout
+
+
 def ensure_haproxy(src_dir: Path, version: str, global_timeout_s: int) -> Path:
     """
     Build HAProxy locally (no root needed) and return haproxy binary path.
+    Builds are cached per (version, machine, OpenSSL) key; an unpacked source tree or a verified
+    tarball from an earlier run is reused instead of re-downloading / re-extracting.
     """
-    out_bin = src_dir / "third_party" / "haproxy" / "haproxy"
-    out_bin.parent.mkdir(parents=True, exist_ok=True)
+    cache_key = hashlib.sha256(f"{version}|{platform.machine()}|{ssl.OPENSSL_VERSION}".encode()).hexdigest()[:12]
+    out_bin = src_dir / "third_party" / f"haproxy-{version}-{cache_key}" / "haproxy"
     if out_bin.exists():
         return out_bin
+    # Pre-keyed layout: still usable if it runs here and is the requested version.
+    legacy_bin = src_dir / "third_party" / "haproxy" / "haproxy"
+    if legacy_bin.exists() and _haproxy_reports_version(legacy_bin, version):
+        return legacy_bin
+    out_bin.parent.mkdir(parents=True, exist_ok=True)
 
     work = src_dir / "third_party" / "haproxy_src"
     work.mkdir(parents=True, exist_ok=True)
     tar = work / f"haproxy-{version}.tar.gz"
+    tar_sum = work / f"haproxy-{version}.tar.gz.sha256"
     url = f"https://www.haproxy.org/download/{version.rsplit('.',1)[0]}/src/haproxy-{version}.tar.gz"
-
-    # Download
-    if not tar.exists():
-        _run(["bash", "-lc", f"timeout {global_timeout_s}s curl -L --fail -o '{tar}' '{url}'"], timeout_s=global_timeout_s)
-    # Extract
-    _run(["bash", "-lc", f"timeout {global_timeout_s}s tar -xzf '{tar}' -C '{work}'"], timeout_s=global_timeout_s)
     src = work / f"haproxy-{version}"
+
+    if not (src / "Makefile").exists():
+        # Download (into .part, so an interrupted fetch never looks like a valid tarball)
+        if not _tarball_ok(tar, tar_sum):
+            part = tar.with_name(tar.name + ".part")
+            _run(["curl", "-L", "--fail", "-o", str(part), url], timeout_s=global_timeout_s)
+            part.replace(tar)
+            tar_sum.write_text(_sha256_file(tar) + "\n")
+        # Extract
+        with tarfile.open(tar, "r:gz") as tf:
+            if hasattr(tarfile, "data_filter"):
+                tf.extractall(work, filter="data")
+            else:
+                tf.extractall(work)
     if not src.exists():
         raise RuntimeError(f"haproxy source not found: {src}")
 
     # Build (static not required; use OpenSSL for typical setups)
     _run(
-        ["bash", "-lc", f"timeout {global_timeout_s}s make -C '{src}' -j 4 TARGET=linux-glibc USE_OPENSSL=1 USE_ZLIB=1"],
+        [
+            "make",
+            "-C",
+            str(src),
+            "-j",
+            str(os.cpu_count() or 1),
+            "TARGET=linux-glibc",
+            "USE_OPENSSL=1",
+            "USE_ZLIB=1",
+        ],
         timeout_s=global_timeout_s,
     )
     built = src / "haproxy"
@@ -260,7 +581,7 @@ threads = 4
 strategy = roundrobin
 log_level = ERROR
 io_model = epoll
-reuse_port = 0
+reuse_port = 1
 
 [backend:1]
 ip = 127.0.0.1
@@ -283,6 +604,7 @@ defaults
   timeout server  5s
 
 frontend fe
+  # HAProxy sets SO_REUSEPORT on listeners by default, so it can bind next to our reservation socket.
   bind 127.0.0.1:{listen_port}
   default_backend be
 
@@ -307,7 +629,41 @@ async def main_async() -> int:
         default=2.0,
         help="Print progress every N seconds (stderr). Use 0 to disable.",
     )
+    ap.add_argument(
+        "--driver",
+        choices=("auto", "asyncio", "wrk"),
+        default="auto",
+        help="Load generator: wrk (native, if on PATH), asyncio (in-process), or auto (wrk when found).",
+    )
+    ap.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="Seconds per run for the wrk driver (the asyncio driver uses --total instead).",
+    )
+    ap.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Pin proxy, haproxy and client+backend to disjoint CPU sets (needs taskset and >= 3 CPUs).",
+    )
+    ap.add_argument(
+        "--parallel-compare",
+        action="store_true",
+        help="Run each scenario's proxy and haproxy loads at the same time (halves wall time; off for fairness).",
+    )
+    ap.add_argument(
+        "--warmup",
+        type=int,
+        default=-1,
+        help="Unmeasured requests per scenario and target before each run (-1: min(2*concurrency, 512); 0: off).",
+    )
     args = ap.parse_args()
+    warmup = min(2 * args.concurrency, 512) if args.warmup < 0 else args.warmup
+
+    wrk_bin = shutil.which("wrk") if args.driver in ("auto", "wrk") else None
+    if args.driver == "wrk" and wrk_bin is None:
+        raise SystemExit("--driver wrk requested but wrk not found on PATH")
+    driver = "wrk" if wrk_bin else "asyncio"
 
     repo = Path(__file__).resolve().parents[1]
     proxy_bin = (repo / args.proxy_bin).resolve()
@@ -316,11 +672,18 @@ async def main_async() -> int:
 
     haproxy_bin = ensure_haproxy(repo, args.haproxy_version, args.global_timeout)
 
-    backend_port = _reserve_free_port()
-    proxy_port = _reserve_free_port()
-    haproxy_port = _reserve_free_port()
+    backend_sock, backend_port = _reserve_free_socket()
+    proxy_hold, proxy_port = _reserve_free_socket()
+    haproxy_hold, haproxy_port = _reserve_free_socket()
 
-    backend = await asyncio.start_server(_backend_handler, "127.0.0.1", backend_port)
+    cpu_sets: Optional[Dict[str, List[int]]] = None
+    if args.pin_cpus:
+        cpu_sets = _cpu_split() if shutil.which("taskset") else None
+        if cpu_sets is None:
+            print("[warn] --pin-cpus: need taskset and >= 3 usable CPUs; running unpinned", file=sys.stderr)
+
+    # The backend listens on its reserved socket directly (no close/rebind window).
+    backend = await asyncio.start_server(_backend_handler, sock=backend_sock, backlog=_LISTEN_BACKLOG)
     try:
         with tempfile.TemporaryDirectory(prefix="proxy_bench_") as td:
             td = Path(td)
@@ -330,18 +693,49 @@ async def main_async() -> int:
             _write_haproxy_conf(hap_conf, haproxy_port, backend_port)
 
             proxy_p = subprocess.Popen(
-                ["timeout", f"{args.global_timeout}s", str(proxy_bin), "-c", str(proxy_conf)],
+                _taskset_prefix(cpu_sets and cpu_sets["proxy"])
+                + ["timeout", f"{args.global_timeout}s", str(proxy_bin), "-c", str(proxy_conf)],
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
             )
             hap_p = subprocess.Popen(
-                ["timeout", f"{args.global_timeout}s", str(haproxy_bin), "-f", str(hap_conf), "-db"],
+                _taskset_prefix(cpu_sets and cpu_sets["haproxy"])
+                + ["timeout", f"{args.global_timeout}s", str(haproxy_bin), "-f", str(hap_conf), "-db"],
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
             )
+            if cpu_sets:
+                # Pin ourselves only after spawning, so the children's taskset masks are independent.
+                os.sched_setaffinity(0, cpu_sets["client"])
             try:
                 await _wait_tcp("127.0.0.1", proxy_port, 3.0)
                 await _wait_tcp("127.0.0.1", haproxy_port, 3.0)
+                # Both children are listening; the bound-but-not-listening holders can go.
+                proxy_hold.close()
+                haproxy_hold.close()
+
+                # With --parallel-compare the two wrk clients get disjoint halves of the client CPU set;
+                # the asyncio driver runs both loads on this one event loop, so no per-run pinning applies.
+                run_cpus: Dict[str, Optional[List[int]]] = {"proxy": None, "haproxy": None}
+                if args.parallel_compare and wrk_bin and cpu_sets and len(cpu_sets["client"]) >= 2:
+                    half = len(cpu_sets["client"]) // 2
+                    run_cpus = {"proxy": cpu_sets["client"][:half], "haproxy": cpu_sets["client"][half:]}
+
+                async def measure(port: int, path: str, cpus: Optional[List[int]] = None) -> Dict[str, float]:
+                    if wrk_bin:
+                        return await _run_load_wrk(
+                            wrk_bin, "127.0.0.1", port, path, args.concurrency, args.duration, args.timeout, cpus
+                        )
+                    r = await _run_load(
+                        "127.0.0.1",
+                        port,
+                        path,
+                        args.concurrency,
+                        args.total,
+                        args.timeout,
+                        args.progress_interval,
+                    )
+                    return _summary(r)
 
                 scenarios = [
                     ("small_2b", "/ok"),
@@ -352,44 +746,45 @@ async def main_async() -> int:
                 out: Dict[str, object] = {
                     "ts": time.time(),
                     "python": sys.version,
+                    "event_loop": "uvloop" if uvloop is not None else "asyncio",
                     "proxy": {"port": proxy_port, "bin": str(proxy_bin)},
                     "haproxy": {"port": haproxy_port, "bin": str(haproxy_bin), "version": args.haproxy_version},
                     "backend": {"port": backend_port},
-                    "params": {"concurrency": args.concurrency, "total": args.total, "timeout": args.timeout},
+                    "params": {
+                        "concurrency": args.concurrency,
+                        "total": args.total,
+                        "timeout": args.timeout,
+                        "driver": driver,
+                        "duration": args.duration if driver == "wrk" else None,
+                        "cpu_sets": cpu_sets,
+                        "parallel_compare": args.parallel_compare,
+                        "warmup": warmup,
+                    },
                     "results": {},
                 }
 
                 for name, path in scenarios:
                     print(
-                        f"[scenario] {name} path={path} total={args.total} concurrency={args.concurrency} "
+                        f"[scenario] {name} path={path} driver={driver} total={args.total} concurrency={args.concurrency} "
                         f"proxy_port={proxy_port} haproxy_port={haproxy_port}",
                         file=sys.stderr,
                         flush=True,
                     )
-                    pr = await _run_load(
-                        "127.0.0.1",
-                        proxy_port,
-                        path,
-                        args.concurrency,
-                        args.total,
-                        args.timeout,
-                        args.progress_interval,
-                    )
-                    hr = await _run_load(
-                        "127.0.0.1",
-                        haproxy_port,
-                        path,
-                        args.concurrency,
-                        args.total,
-                        args.timeout,
-                        args.progress_interval,
-                    )
-                    out["results"][name] = {
-                        "proxy": _summary(pr),
-                        "haproxy": _summary(hr),
-                    }
-
-                (repo / args.output).write_text(json.dumps(out, indent=2, sort_keys=True), encoding="utf-8")
+                    if warmup > 0:
+                        # Open connections and fault in buffers on every hop before timing anything.
+                        for port in (proxy_port, haproxy_port):
+                            await _run_load("127.0.0.1", port, path, args.concurrency, warmup, args.timeout, 0)
+                    if args.parallel_compare:
+                        pr, hr = await asyncio.gather(
+                            measure(proxy_port, path, run_cpus["proxy"]),
+                            measure(haproxy_port, path, run_cpus["haproxy"]),
+                        )
+                    else:
+                        pr = await measure(proxy_port, path)
+                        hr = await measure(haproxy_port, path)
+                    out["results"][name] = {"proxy": pr, "haproxy": hr}
+
+                (repo / args.output).write_bytes(_results_json(out))
             finally:
                 for p in (proxy_p, hap_p):
                     try:
@@ -405,12 +800,28 @@ async def main_async() -> int:
                         except Exception:
                             pass
     finally:
+        proxy_hold.close()
+        haproxy_hold.close()
         backend.close()
         await backend.wait_closed()
     return 0
 
 
+def _raise_nofile_limit(target: int = 65535) -> None:
+    # Many keep-alive sockets (client + backend ends) can exceed the common 1024 soft limit.
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        want = target if hard == resource.RLIM_INFINITY else min(hard, target)
+        if soft != resource.RLIM_INFINITY and soft < want:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+    except (ValueError, OSError):
+        pass
+
+
 def main() -> int:
+    _raise_nofile_limit()
+    if uvloop is not None:
+        uvloop.install()
     try:
         return asyncio.run(main_async())
     except KeyboardInterrupt:
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import functools
 import http.client
 import json
 import os
@@ -8,54 +10,124 @@ import subprocess
 import sys
 import threading
 import time
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-
-
-class DemoBackendHandler(BaseHTTPRequestHandler):
-    server_version = "DemoBackend/0.1"
-
-    def do_GET(self):
-        if self.path == "/health":
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain")
-            self.end_headers()
-            self.wfile.write(b"ok\n")
-            return
-
-        if self.path.startswith("/hello"):
-            msg = f"hello from backend {self.server.backend_name}\n".encode("utf-8")
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain")
-            self.send_header("Content-Length", str(len(msg)))
-            self.end_headers()
-            self.wfile.write(msg)
-            return
-
-        self.send_response(404)
-        self.end_headers()
-
-    def log_message(self, fmt, *args):
-        # Keep demo quiet.
+
+
+def _response(status: bytes, body: bytes = b"") -> bytes:
+    return (
+        b"HTTP/1.1 " + status + b"\r\n"
+        b"Server: DemoBackend/0.1\r\n"
+        b"Content-Type: text/plain\r\n"
+        b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n"
+        b"\r\n" + body
+    )
+
+
+_HEALTH_RESP = _response(b"200 OK", b"ok\n")
+_NOT_FOUND_RESP = _response(b"404 Not Found")
+
+
+def _has_body(head_lower: bytes) -> bool:
+    if b"\r\ntransfer-encoding:" in head_lower:
+        return True
+    i = head_lower.find(b"\r\ncontent-length:")
+    if i < 0:
+        return False
+    i += len(b"\r\ncontent-length:")
+    return head_lower[i : head_lower.find(b"\r\n", i)].strip() != b"0"
+
+
+async def _backend_handler(hello_resp: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Keep-alive loop; every response is a prebuilt bytes object.
+    try:
+        while True:
+            try:
+                data = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.CancelledError, Exception):
+                # EOF, or cancelled at shutdown (Python 3.11's stream callback logs cancelled handler
+                # tasks as errors, so end quietly).
+                return
+            lower = data.lower()
+            # Request bodies are never read: reply and close, or the body would be parsed as the next request.
+            close = b"\r\nconnection: close" in lower or _has_body(lower)
+            # Request line "METHOD PATH HTTP/1.1": match the path on bytes, no decode.
+            path = data.find(b" ") + 1
+            if data.startswith(b"/health ", path):
+                resp = _HEALTH_RESP
+            elif data.startswith(b"/hello", path):
+                resp = hello_resp
+            else:
+                resp = _NOT_FOUND_RESP
+            if close:
+                resp = resp.replace(b"\r\n\r\n", b"\r\nConnection: close\r\n\r\n", 1)
+            writer.write(resp)
+            await writer.drain()
+            if close:
+                return
+    except (asyncio.CancelledError, Exception):
         return
+    finally:
+        writer.close()
 
 
-def start_backend(port: int, name: str):
-    httpd = ThreadingHTTPServer(("127.0.0.1", port), DemoBackendHandler)
-    httpd.backend_name = name
-    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+def start_backends(backends: list[tuple[int, str]]):
+    """Serve all demo backends from one asyncio loop on a single daemon thread."""
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=loop.run_forever, daemon=True)
     t.start()
-    return httpd, t
-
+    servers = []
+    try:
+        for port, name in backends:
+            hello_resp = _response(b"200 OK", f"hello from backend {name}\n".encode("utf-8"))
+            fut = asyncio.run_coroutine_threadsafe(
+                asyncio.start_server(functools.partial(_backend_handler, hello_resp), "127.0.0.1", port), loop
+            )
+            servers.append(fut.result(timeout=2.0))
+    except BaseException:
+        stop_backends(loop, t, servers)
+        raise
+    return loop, t, servers
+
+
+def stop_backends(loop: asyncio.AbstractEventLoop, t: threading.Thread, servers) -> None:
+    async def shutdown():
+        for srv in servers:
+            srv.close()
+        # The proxy may still hold idle keep-alive connections: cancel their handlers.
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-def request(method: str, host: str, port: int, path: str, body: bytes | None = None, headers: dict | None = None):
-    conn = http.client.HTTPConnection(host, port, timeout=2.0)
+    try:
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=1.0)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    t.join(timeout=1.0)
+    if not t.is_alive():
+        loop.close()
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body: bytes | None = None, headers: dict | None = None):
+    # The connection is kept alive between calls; http.client reconnects by itself when the
+    # server answered with Connection: close (e.g. the proxy's admin endpoints).
     conn.request(method, path, body=body, headers=headers or {})
     resp = conn.getresponse()
     data = resp.read()
-    conn.close()
     return resp.status, data
 
 
+def post_json(conn: http.client.HTTPConnection, path: str, payload: dict):
+    body = json.dumps(payload).encode("utf-8")
+    return request(
+        conn,
+        "POST",
+        path,
+        body=body,
+        headers={"Content-Type": "application/json", "Content-Length": str(len(body))},
+    )
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--proxy-bin", default=os.path.join("build", "proxy_server"))
@@ -65,9 +137,9 @@ def main():
 
     deadline = time.time() + args.timeout
 
-    b1, t1 = start_backend(19001, "19001")
-    b2, t2 = start_backend(19002, "19002")
+    loop, backend_thread, backends = start_backends([(19001, "19001"), (19002, "19002")])
     proc = None
+    conn = http.client.HTTPConnection("127.0.0.1", 18080, timeout=2.0)
 
     try:
         if not os.path.exists(args.proxy_bin):
@@ -85,14 +157,7 @@ def main():
             "vram_used_mb": 1024,
             "vram_total_mb": 16384,
         }
-        status, _ = request(
-            "POST",
-            "127.0.0.1",
-            18080,
-            "/admin/backend_metrics",
-            body=json.dumps(payload).encode("utf-8"),
-            headers={"Content-Type": "application/json", "Content-Length": str(len(json.dumps(payload)))},
-        )
+        status, _ = post_json(conn, "/admin/backend_metrics", payload)
         if status != 200:
             print(f"admin update failed: {status}", file=sys.stderr)
             return 3
@@ -105,26 +170,19 @@ def main():
             "vram_used_mb": 8192,
             "vram_total_mb": 16384,
         }
-        status, _ = request(
-            "POST",
-            "127.0.0.1",
-            18080,
-            "/admin/backend_metrics",
-            body=json.dumps(payload2).encode("utf-8"),
-            headers={"Content-Type": "application/json", "Content-Length": str(len(json.dumps(payload2)))},
-        )
+        status, _ = post_json(conn, "/admin/backend_metrics", payload2)
         if status != 200:
             print(f"admin update failed: {status}", file=sys.stderr)
             return 3
 
-        status, data = request("GET", "127.0.0.1", 18080, "/hello", headers={"Host": "demo"})
+        status, data = request(conn, "GET", "/hello", headers={"Host": "demo"})
         body = data.decode("utf-8", errors="replace")
         print(f"/hello -> {status} {body.strip()}")
         if "19002" not in body:
             print("unexpected backend selection (expected 19002 via gpu strategy)", file=sys.stderr)
             return 4
 
-        status, data = request("GET", "127.0.0.1", 18080, "/stats", headers={"Host": "demo"})
+        status, data = request(conn, "GET", "/stats", headers={"Host": "demo"})
         print(f"/stats -> {status} bytes={len(data)}")
 
         # Hard stop if we overrun.
@@ -135,16 +193,14 @@ def main():
         print("DEMO OK")
         return 0
     finally:
+        conn.close()
         if proc is not None and proc.poll() is None:
             proc.send_signal(signal.SIGTERM)
             try:
                 proc.wait(timeout=2.0)
             except subprocess.TimeoutExpired:
                 proc.kill()
-        b1.shutdown()
-        b2.shutdown()
-        t1.join(timeout=1.0)
-        t2.join(timeout=1.0)
+        stop_backends(loop, backend_thread, backends)
 
 
 if __name__ == "__main__":
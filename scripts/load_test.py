@@ -2,36 +2,32 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import json
 import random
+import sys
 import time
-import urllib.error
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from urllib.parse import urlsplit
 
+from _aio import run_workers, use_eager_tasks
+from _http_client import read_http_response
+from _latency import LatencyStats
 
-def http_json(url: str, method: str, body: bytes, headers: dict[str, str], timeout: float) -> dict:
-    req = urllib.request.Request(url, data=body, method=method)
-    for k, v in headers.items():
-        req.add_header(k, v)
-    with urllib.request.urlopen(req, timeout=timeout) as r:
-        data = r.read()
-    return json.loads(data.decode("utf-8"))
+try:
+    import httpx
+except ImportError:  # optional; only needed for --client httpx
+    httpx = None
 
-
-def percentile(sorted_vals: list[float], p: float) -> float:
-    if not sorted_vals:
-        return 0.0
-    if p <= 0:
-        return sorted_vals[0]
-    if p >= 1:
-        return sorted_vals[-1]
-    idx = int(p * (len(sorted_vals) - 1))
-    return sorted_vals[idx]
+try:
+    import aiohttp
+except ImportError:  # optional; only needed for --client aiohttp
+    aiohttp = None
 
 
 def main() -> int:
-    ap = argparse.ArgumentParser(description="Simple load test script (stdlib only).")
+    ap = argparse.ArgumentParser(
+        description="Simple load test script (stdlib asyncio keep-alive client; optional httpx/aiohttp clients)."
+    )
     ap.add_argument("--base", default="http://127.0.0.1:18080", help="proxy base URL")
     ap.add_argument("--path", default="/infer", help="request path")
     ap.add_argument("--duration", type=float, default=10.0, help="seconds")
@@ -41,10 +37,33 @@ def main() -> int:
     ap.add_argument("--payload-bytes", type=int, default=2048, help="JSON body size (approx)")
     ap.add_argument("--mode", choices=["spread", "model_affinity"], default="spread")
     ap.add_argument("--models", default="llama,qwen,gemma,mixtral")
+    ap.add_argument(
+        "--keep-samples",
+        action="store_true",
+        help="keep every latency sample for exact percentiles (default: streaming P² estimates)",
+    )
+    ap.add_argument(
+        "--client",
+        choices=["stdlib", "httpx", "aiohttp"],
+        default="stdlib",
+        help="HTTP client: stdlib raw HTTP/1.1 frames, httpx (HTTP/2 when negotiated, needs httpx[http2]) or aiohttp",
+    )
     args = ap.parse_args()
+    if args.client == "httpx" and httpx is None:
+        ap.error("--client httpx requires httpx (pip install 'httpx[http2]')")
+    if args.client == "aiohttp" and aiohttp is None:
+        ap.error("--client aiohttp requires aiohttp")
 
     base = args.base.rstrip("/")
     url = f"{base}{args.path}?work_ms={args.work_ms}"
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        ap.error(f"unsupported --base: {args.base}")
+    host = parts.hostname
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    use_tls = parts.scheme == "https"
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    host_header = parts.netloc
     models = [m.strip() for m in args.models.split(",") if m.strip()]
     if not models:
         models = ["mock"]
@@ -53,76 +72,167 @@ def main() -> int:
     body = json.dumps(payload).encode("utf-8")
 
     end = time.time() + args.duration
-    lats_ms: list[float] = []
+    lats = LatencyStats(args.keep_samples)
     by_backend: dict[str, int] = {}
     by_model: dict[str, int] = {}
+    by_version: dict[str, int] = {}
     errors = 0
     total = 0
 
-    def one(req_id: int):
-        headers = {"Content-Type": "application/json", "X-Request-Id": str(req_id)}
-        model = ""
-        if args.mode == "model_affinity":
-            model = random.choice(models)
-            headers["X-Model"] = model
-        t0 = time.time()
+    # Raw request frames are encoded once: a per-model prefix up to the X-Request-Id value and a shared
+    # tail carrying the body, so each request is a single join with the id (no per-call header/urllib objects).
+    def frame_prefix(model: str) -> bytes:
+        return (
+            f"POST {target} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            + (f"X-Model: {model}\r\n" if model else "")
+            + "X-Request-Id: "
+        ).encode("ascii")
+
+    frame_tail = b"\r\n\r\n" + body
+    if args.mode == "model_affinity":
+        prefixes = {m: frame_prefix(m) for m in models}
+        model_seq = random.choices(models, k=65536)  # drawn up front instead of random.choice per request
+    else:
+        prefixes = {"": frame_prefix("")}
+        model_seq = [""]
+
+    # Header dicts for the library clients, built once per model; only X-Request-Id varies per call.
+    lib_headers = {
+        m: {"Content-Type": "application/json", **({"X-Model": m} if m else {})} for m in prefixes
+    }
+
+    def stdlib_requester():
+        # One persistent HTTP/1.1 connection per worker, written as pre-encoded frames.
+        conn: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+
+        async def request(req_id: int, model: str) -> tuple[int, bytes, str]:
+            nonlocal conn
+            req = b"".join((prefixes[model], str(req_id).encode("ascii"), frame_tail))
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(
+                        asyncio.open_connection(host, port, ssl=use_tls or None), timeout=args.timeout
+                    )
+                reader, writer = conn
+                writer.write(req)
+                code, data, close, version = await asyncio.wait_for(read_http_response(reader), timeout=args.timeout)
+            except BaseException:
+                if conn is not None:
+                    conn[1].close()
+                    conn = None
+                raise
+            if close:
+                conn[1].close()
+                conn = None
+            return code, data, version
+
+        def close() -> None:
+            if conn is not None:
+                conn[1].close()
+
+        return request, close
+
+    def httpx_requester(client):
+        async def request(req_id: int, model: str) -> tuple[int, bytes, str]:
+            resp = await client.post(url, content=body, headers={**lib_headers[model], "X-Request-Id": str(req_id)})
+            return resp.status_code, resp.content, resp.http_version
+
+        return request, lambda: None
+
+    def aiohttp_requester(session):
+        async def request(req_id: int, model: str) -> tuple[int, bytes, str]:
+            headers = {**lib_headers[model], "X-Request-Id": str(req_id)}
+            async with session.post(url, data=body, headers=headers) as resp:
+                data = await resp.read()
+                return resp.status, data, f"HTTP/{resp.version.major}.{resp.version.minor}"
+
+        return request, lambda: None
+
+    # ValueError covers bad status lines/lengths and json.JSONDecodeError.
+    client_errors: tuple[type[BaseException], ...] = (
+        OSError,
+        asyncio.TimeoutError,
+        asyncio.IncompleteReadError,
+        asyncio.LimitOverrunError,
+        ValueError,
+    )
+    if args.client == "httpx":
+        client_errors += (httpx.HTTPError,)
+    elif args.client == "aiohttp":
+        client_errors += (aiohttp.ClientError,)
+
+    next_id = 0
+
+    async def worker(make_requester) -> None:
+        # One coroutine per concurrency slot: `concurrency` requests in flight at any time.
+        nonlocal next_id, total, errors
+        request, close = make_requester()
         try:
-            j = http_json(url, method="POST", body=body, headers=headers, timeout=args.timeout)
-            dt = (time.time() - t0) * 1000.0
-            backend = str(j.get("backend", "-"))
-            return backend, dt, model, None
-        except (urllib.error.URLError, json.JSONDecodeError) as e:
-            dt = (time.time() - t0) * 1000.0
-            return "-", dt, model, str(e)
-
-    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as ex:
-        futures = []
-        req_id = 0
-        while time.time() < end:
-            while len(futures) < args.concurrency and time.time() < end:
-                req_id += 1
-                futures.append(ex.submit(one, req_id))
-
-            done = []
+            while time.time() < end:
+                next_id += 1
+                req_id = next_id
+                model = model_seq[req_id % len(model_seq)]
+                t0 = time.time()
+                err = None
+                backend = "-"
+                try:
+                    code, data, version = await request(req_id, model)
+                    by_version[version] = by_version.get(version, 0) + 1
+                    if code >= 400:
+                        err = f"HTTP {code}"
+                    else:
+                        obj = json.loads(data)
+                        if isinstance(obj, dict):
+                            backend = str(obj.get("backend", "-"))
+                        else:
+                            err = f"unexpected JSON body: {type(obj).__name__}"
+                except client_errors as e:
+                    err = str(e) or type(e).__name__
+                dt = (time.time() - t0) * 1000.0
+                total += 1
+                lats.add(dt)
+                if err:
+                    errors += 1
+                    continue
+                by_backend[backend] = by_backend.get(backend, 0) + 1
+                if args.mode == "model_affinity" and model:
+                    by_model[model] = by_model.get(model, 0) + 1
+        finally:
+            close()
+
+    async def run_pool(make_requester) -> None:
+        await run_workers(lambda: worker(make_requester), max(1, args.concurrency))
+
+    async def driver() -> None:
+        use_eager_tasks()
+        if args.client == "httpx":
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
             try:
-                for f in as_completed(futures, timeout=0.2):
-                    done.append(f)
-                    backend, dt, model, err = f.result()
-                    total += 1
-                    lats_ms.append(dt)
-                    if err:
-                        errors += 1
-                        continue
-                    by_backend[backend] = by_backend.get(backend, 0) + 1
-                    if args.mode == "model_affinity" and model:
-                        by_model[model] = by_model.get(model, 0) + 1
-            except FuturesTimeoutError:
-                pass
-
-            if done:
-                done_set = set(done)
-                futures = [x for x in futures if x not in done_set]
-
-        # drain remaining
-        for f in as_completed(futures):
-            backend, dt, model, err = f.result()
-            total += 1
-            lats_ms.append(dt)
-            if err:
-                errors += 1
-                continue
-            by_backend[backend] = by_backend.get(backend, 0) + 1
-            if args.mode == "model_affinity" and model:
-                by_model[model] = by_model.get(model, 0) + 1
-
-    lats_ms.sort()
-    p50 = percentile(lats_ms, 0.50)
-    p90 = percentile(lats_ms, 0.90)
-    p99 = percentile(lats_ms, 0.99)
+                client = httpx.AsyncClient(http2=True, limits=limits, timeout=args.timeout)
+            except ImportError:
+                print("warning: h2 is not installed; httpx falls back to HTTP/1.1", file=sys.stderr)
+                client = httpx.AsyncClient(limits=limits, timeout=args.timeout)
+            async with client:
+                await run_pool(lambda: httpx_requester(client))
+        elif args.client == "aiohttp":
+            connector = aiohttp.TCPConnector(limit=args.concurrency)
+            timeout = aiohttp.ClientTimeout(total=args.timeout)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                await run_pool(lambda: aiohttp_requester(session))
+        else:
+            await run_pool(stdlib_requester)
+
+    asyncio.run(driver())
+
+    p50, p90, p99, _ = lats.points() or (0.0, 0.0, 0.0, 0.0)
 
     print(f"url={url}")
     print(f"total={total} errors={errors} concurrency={args.concurrency} duration={args.duration:.1f}s work_ms={args.work_ms}")
     print(f"latency_ms: p50={p50:.1f} p90={p90:.1f} p99={p99:.1f}")
+    print(f"client={args.client} http_version: " + (", ".join(f"{k}={v}" for k, v in sorted(by_version.items())) or "-"))
     print("")
     print("backend distribution (top 10):")
     for k, v in sorted(by_backend.items(), key=lambda kv: (-kv[1], kv[0]))[:10]:
@@ -2,11 +2,61 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
+import itertools
+import json
 import os
 import subprocess
 import sys
 from pathlib import Path
 
+from _test_runner import run_all
+
+
+def parse_matrix(specs: list[str]) -> list[tuple[str, list[str]]]:
+    axes = []
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        vals = [v for v in values.split(",") if v]
+        if not sep or not key or not vals:
+            raise ValueError(f"bad --matrix entry {spec!r}, expected OPTION=V1,V2,...")
+        axes.append((key.replace("_", "-"), vals))
+    return axes
+
+
+def bench_matrix(base_argv: list[str], axes: list[tuple[str, list[str]]], output: str) -> int:
+    """
+    Run benchmark.py once per combination of the matrix axes inside this interpreter (no Python
+    start-up per cell) and write all results to one JSON file. Returns the first non-zero exit code.
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import benchmark
+
+    # --client-cpus pins the calling process; restore it so every cell starts from the same affinity.
+    affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    cells = []
+    rc = 0
+    for values in itertools.product(*(vals for _, vals in axes)):
+        params = {key: v for (key, _), v in zip(axes, values)}
+        print("== " + " ".join(f"{k}={v}" for k, v in params.items()), flush=True)
+        try:
+            # Later options win in argparse, so matrix values override the defaults in base_argv.
+            cell_rc, result = benchmark.run(base_argv + [x for k, v in params.items() for x in (f"--{k}", v)])
+        except SystemExit as e:
+            # parser.error() for a bad value in this cell (or a failing --client-cpus): record it and keep
+            # going, so the cells that already ran still reach the output file.
+            cell_rc, result = (e.code if isinstance(e.code, int) else 2), None
+        finally:
+            if affinity is not None:
+                os.sched_setaffinity(0, affinity)
+            # run() installs uvloop's policy when enabled; start the next cell from the default policy.
+            asyncio.set_event_loop_policy(None)
+        cells.append({"params": params, "rc": cell_rc, "result": result})
+        rc = rc or cell_rc
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"cells": cells}, f, ensure_ascii=False, indent=2)
+    return rc
+
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Proxy management helper (minimal).")
@@ -24,6 +74,10 @@ def main() -> int:
     p_test = sub.add_parser("test", help="Run unit/integration tests with timeouts")
     p_test.add_argument("-B", "--build-dir", default="build")
     p_test.add_argument("--timeout", type=int, default=20)
+    p_test.add_argument(
+        "-j", "--jobs", type=int, default=1, help="test binaries run in parallel (0 = CPU count; some tests use fixed ports)"
+    )
+    p_test.add_argument("--fail-fast", action="store_true", help="stop scheduling tests after the first failure")
 
     p_bench = sub.add_parser("bench", help="Run local benchmark (wrap scripts/benchmark.py)")
     p_bench.add_argument("--mode", default="all")
@@ -31,6 +85,13 @@ def main() -> int:
     p_bench.add_argument("--port", type=int, default=8084)
     p_bench.add_argument("--config", default="config/bench.conf")
     p_bench.add_argument("--output", default="bench_results_managed.json")
+    p_bench.add_argument(
+        "--matrix",
+        nargs="+",
+        metavar="OPTION=V1,V2",
+        help="run every combination in-process, e.g. port=8084,8085 bench=http_stats,connect_hold "
+        "(OPTION is any benchmark.py option)",
+    )
 
     args = parser.parse_args()
 
@@ -48,47 +109,34 @@ def main() -> int:
         return subprocess.call(["cmake", "--build", str(build_dir), "-j"])
 
     if args.cmd == "test":
-        build_dir = Path(args.build_dir)
-        # Discover test binaries by prefix.
-        tests = sorted(p.name for p in build_dir.glob("test_*") if p.is_file())
-        if not tests:
-            print("ERROR: no test binaries found; run manage.py build first", file=sys.stderr)
-            return 1
-        env = os.environ.copy()
-        for t in tests:
-            print(f"RUN {t}")
-            code = subprocess.call(["timeout", f"{args.timeout}s", str(build_dir / t)], env=env)
-            if code != 0:
-                print(f"FAIL {t} exit={code}", file=sys.stderr)
-                return code
-        print("OK")
-        return 0
+        return run_all(Path(args.build_dir), args.timeout, args.jobs, args.fail_fast)
 
     if args.cmd == "bench":
-        return subprocess.call(
-            [
-                sys.executable,
-                "scripts/benchmark.py",
-                "--host",
-                "127.0.0.1",
-                "--port",
-                str(args.port),
-                "--mode",
-                args.mode,
-                "--bench",
-                args.bench,
-                "--global-timeout",
-                "60",
-                "--spawn-server",
-                "--server-bin",
-                "./build/proxy_server",
-                "--server-config",
-                args.config,
-                "--output",
-                args.output,
-                "--include-uring",
-            ]
-        )
+        bench_argv = [
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(args.port),
+            "--mode",
+            args.mode,
+            "--bench",
+            args.bench,
+            "--global-timeout",
+            "60",
+            "--spawn-server",
+            "--server-bin",
+            "./build/proxy_server",
+            "--server-config",
+            args.config,
+            "--include-uring",
+        ]
+        if args.matrix:
+            try:
+                axes = parse_matrix(args.matrix)
+            except ValueError as e:
+                parser.error(str(e))
+            return bench_matrix(bench_argv, axes, args.output)
+        return subprocess.call([sys.executable, "scripts/benchmark.py"] + bench_argv + ["--output", args.output])
 
     return 1
 
@@ -2,12 +2,31 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import json
 import os
-import threading
-import time
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from urllib.parse import urlparse, parse_qs
+import re
+from collections import defaultdict
+from functools import lru_cache
+from http import HTTPStatus
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # optional; the default asyncio loop is used otherwise
+    uvloop = None
+
+
+if orjson is not None:
+    json_bytes = orjson.dumps
+else:
+    def json_bytes(obj) -> bytes:
+        # Same compact UTF-8 output as orjson.
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 
 class BackendState:
@@ -19,34 +38,47 @@ class BackendState:
         self.capacity = max(1, capacity)
         self.vram_total_mb = max(0, vram_total_mb)
 
-        self._lock = threading.Lock()
+        # Only touched from the event loop thread: no lock needed.
         self._inflight = 0
         self._total = 0
-        self._by_model = {}
+        self._by_model: defaultdict[str, int] = defaultdict(int)
+        # Encoded /ai/status bodies keyed by inflight (the only input that changes). Several recent values stay
+        # cached, so inflight moving up and down under load does not re-encode on every poll; never stale.
+        self._status_body = lru_cache(maxsize=256)(self._encode_status)
+
+        # Immutable parts of the responses, built once: /backend/info copies a dict template, while
+        # /hello and /infer splice the volatile counters into pre-encoded JSON prefixes/suffixes.
+        self._info_tmpl = {
+            "backend": backend_id,
+            "model": model,
+            "version": version,
+            "loaded": loaded,
+            "capacity": self.capacity,
+        }
+        self._hello_prefix = json_bytes({"ok": True, "backend": backend_id})[:-1] + b',"inflight":'
+        self._infer_prefix = (
+            json_bytes({"ok": True, "backend": backend_id, "model": model, "version": version, "loaded": loaded})[:-1]
+            + b',"inflight":'
+        )
+        self._infer_suffix = b',"pid":%d}' % os.getpid()
 
     def on_start(self):
-        with self._lock:
-            self._inflight += 1
-            self._total += 1
+        self._inflight += 1
+        self._total += 1
 
     def on_end(self):
-        with self._lock:
-            self._inflight = max(0, self._inflight - 1)
-
-    def snapshot(self):
-        with self._lock:
-            inflight = self._inflight
-            total = self._total
-        return inflight, total
+        # Only ever called from the finally after a matching on_start(), and updates never interleave on the
+        # loop thread, so the count cannot go negative: no clamp needed.
+        self._inflight -= 1
 
     def record_model(self, model: str):
         if not model:
             return
-        with self._lock:
-            self._by_model[model] = self._by_model.get(model, 0) + 1
+        self._by_model[model] += 1
 
-    def ai_status(self):
-        inflight, _ = self.snapshot()
+    def ai_status(self, inflight: int | None = None):
+        if inflight is None:
+            inflight = self._inflight
         # “拟真”指标：由真实 in-flight 推导，避免手工随意注入。
         queue_len = inflight
         gpu_util = min(1.0, float(inflight) / float(self.capacity))
@@ -63,96 +95,236 @@ class BackendState:
             "loaded": 1 if self.loaded else 0,
         }
 
+    def hello_bytes(self) -> bytes:
+        return b'%b%d,"total":%d}' % (self._hello_prefix, self._inflight, self._total)
+
+    def info_bytes(self) -> bytes:
+        d = self._info_tmpl.copy()
+        d["inflight"] = self._inflight
+        d["total"] = self._total
+        return json_bytes(d)
+
+    def infer_bytes(self, work_ms: float) -> bytes:
+        # repr() of a finite float is the same shortest round-trip form json/orjson emit.
+        return b'%b%d,"total":%d,"work_ms":%b%b' % (
+            self._infer_prefix,
+            self._inflight,
+            self._total,
+            repr(work_ms).encode("ascii"),
+            self._infer_suffix,
+        )
+
+    def _encode_status(self, inflight: int) -> bytes:
+        return json_bytes(self.ai_status(inflight))
+
+    def ai_status_bytes(self) -> bytes:
+        return self._status_body(self._inflight)
+
+
+def query_value(query: str, key: str, default: str) -> str:
+    """First non-empty `key=value` in a raw query string, like parse_qs()[key][0] minus percent-decoding
+    (only numeric parameters are read)."""
+    needle = key + "="
+    i = query.find(needle)
+    while i >= 0:
+        start = i + len(needle)
+        end = query.find("&", start)
+        if end < 0:
+            end = len(query)
+        if (i == 0 or query[i - 1] == "&") and end > start:
+            return query[start:end]
+        i = query.find(needle, end)
+    return default
+
+
+MAX_HEAD_BYTES = 64 * 1024
+MAX_BODY_BYTES = 2 * 1024 * 1024
+BODY_CHUNK_BYTES = 64 * 1024
+
+SERVER_VERSION = "MockAIB/1.0"
+JSON_TYPE = "application/json; charset=utf-8"
+TEXT_TYPE = "text/plain; charset=utf-8"
+
+# Method, target and HTTP/1.x minor version, matched against the raw head in one C-level pass.
+_REQUEST_LINE = re.compile(r"([A-Z]+) (\S+) HTTP/1\.([01])\r\n")
+
+# (code, content type, close) -> status line and headers up to "Content-Length: ".
+_head_prefixes: dict[tuple[int, str, bool], bytes] = {}
+
+
+def response_bytes(code: int, body: bytes, content_type: str = JSON_TYPE, close: bool = False) -> bytes:
+    key = (code, content_type, close)
+    prefix = _head_prefixes.get(key)
+    if prefix is None:
+        prefix = (
+            f"HTTP/1.1 {code} {HTTPStatus(code).phrase}\r\n"
+            f"Server: {SERVER_VERSION}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n"
+            "Content-Length: "
+        ).encode("latin-1")
+        _head_prefixes[key] = prefix
+    return b"%b%d\r\n\r\n%b" % (prefix, len(body), body)
+
+
+# Fixed replies, encoded once: load tests hammer /health.
+_HEALTH_RESP = response_bytes(200, b"OK\n", TEXT_TYPE)
+_HEALTH_RESP_CLOSE = response_bytes(200, b"OK\n", TEXT_TYPE, close=True)
+_NOT_FOUND_RESP = response_bytes(404, b"not found\n", TEXT_TYPE)
+_NOT_FOUND_RESP_CLOSE = response_bytes(404, b"not found\n", TEXT_TYPE, close=True)
 
-class Handler(BaseHTTPRequestHandler):
-    server_version = "MockAIB/1.0"
 
-    def _send(self, code: int, body: bytes, content_type: str = "application/json; charset=utf-8"):
-        self.send_response(code)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Content-Length", str(len(body)))
-        self.send_header("Connection", "close")
-        self.end_headers()
+class Handler:
+    """One connection on the asyncio server: HTTP/1.1 keep-alive loop of parse, dispatch, reply."""
+
+    def __init__(self, state: BackendState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.state = state
+        self.reader = reader
+        self.writer = writer
+        self.command = ""
+        self.path = ""
+        self.headers: dict[str, str] = {}
+        self.close_connection = False
+
+    async def handle(self):
         try:
-            self.wfile.write(body)
-        except BrokenPipeError:
+            while not self.close_connection:
+                try:
+                    head = await self.reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    self.close_connection = True
+                    self._send(431, b"request header too large\n", TEXT_TYPE)
+                    await self.writer.drain()
+                    return
+                if not self._parse_head(head):
+                    self.close_connection = True
+                    self._send(400, b"bad request\n", TEXT_TYPE)
+                elif self.command == "GET":
+                    if self._has_body():
+                        self.close_connection = True  # GET bodies are never read
+                    self.do_GET()
+                elif self.command == "POST":
+                    await self.do_POST()
+                else:
+                    # The request body (if any) is not read: the connection cannot be reused.
+                    self.close_connection = True
+                    self._send(501, b"unsupported method\n", TEXT_TYPE)
+                await self.writer.drain()
+        except (asyncio.CancelledError, asyncio.IncompleteReadError, ConnectionError):
+            # Peer went away (EOF between requests included), or the server is shutting down
+            # (Python 3.11's stream callback logs cancelled handler tasks as errors, so end quietly).
             pass
+        finally:
+            self.writer.close()
+
+    def _parse_head(self, head: bytes) -> bool:
+        text = head.decode("latin-1")
+        m = _REQUEST_LINE.match(text)
+        if m is None:
+            return False
+        self.command, self.path, minor = m.groups()
+        headers = self.headers = {}
+        for line in text[m.end():].split("\r\n"):
+            if not line:
+                break  # the blank line ending the head
+            name, sep, value = line.partition(":")
+            if not sep:
+                return False
+            headers[name.strip().lower()] = value.strip()
+        # HTTP/1.1 persists unless the client says close; HTTP/1.0 only with an explicit keep-alive.
+        conn = headers.get("connection", "").lower()
+        if minor == "1":
+            self.close_connection = "close" in conn
+        else:
+            self.close_connection = "keep-alive" not in conn
+        return True
+
+    def _has_body(self) -> bool:
+        # A request whose body is left unread must not keep the connection: the body bytes would be
+        # parsed as the next request.
+        return self.headers.get("content-length", "0") != "0" or "transfer-encoding" in self.headers
+
+    async def _discard_body(self, remaining: int):
+        # The body is ignored. StreamReader has no readinto(), so drain it in bounded chunks rather than
+        # materialising one body-sized bytes object (and letting the reader buffer grow to match).
+        read = self.reader.read
+        while remaining > 0:
+            chunk = await read(min(remaining, BODY_CHUNK_BYTES))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(chunk)
+
+    def _send(self, code: int, body: bytes, content_type: str = JSON_TYPE):
+        # Head and body in one write, so the transport sends the response with a single send().
+        self.writer.write(response_bytes(code, body, content_type, self.close_connection))
 
     def _json(self, code: int, obj):
-        self._send(code, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+        self._send(code, json_bytes(obj))
 
-    def do_GET(self):
-        st: BackendState = self.server.state  # type: ignore[attr-defined]
-        u = urlparse(self.path)
-        if u.path == "/health":
-            self._send(200, b"OK\n", "text/plain; charset=utf-8")
-            return
-        if u.path == "/hello":
-            inflight, total = st.snapshot()
-            self._json(200, {"ok": True, "backend": st.backend_id, "inflight": inflight, "total": total})
-            return
-        if u.path == "/ai/status":
-            self._json(200, st.ai_status())
-            return
-        if u.path == "/backend/info":
-            inflight, total = st.snapshot()
-            self._json(
-                200,
-                {
-                    "backend": st.backend_id,
-                    "model": st.model,
-                    "version": st.version,
-                    "loaded": st.loaded,
-                    "capacity": st.capacity,
-                    "inflight": inflight,
-                    "total": total,
-                },
-            )
-            return
-        self._send(404, b"not found\n", "text/plain; charset=utf-8")
+    def _h_health(self):
+        self.writer.write(_HEALTH_RESP_CLOSE if self.close_connection else _HEALTH_RESP)
 
-    def do_POST(self):
-        st: BackendState = self.server.state  # type: ignore[attr-defined]
-        u = urlparse(self.path)
-        if u.path not in ("/infer", "/infer_stream"):
-            self._send(404, b"not found\n", "text/plain; charset=utf-8")
-            return
+    def _h_hello(self):
+        self._send(200, self.state.hello_bytes())
+
+    def _h_status(self):
+        self._send(200, self.state.ai_status_bytes())
+
+    def _h_info(self):
+        self._send(200, self.state.info_bytes())
 
+    async def _h_infer(self, query: str):
+        st = self.state
         st.on_start()
         try:
-            qs = parse_qs(u.query or "")
-            work_ms = float(qs.get("work_ms", ["200"])[0])
+            work_ms = float(query_value(query, "work_ms", "200"))
             work_ms = max(0.0, min(work_ms, 10_000.0))
-            model = self.headers.get("X-Model", "")
+            model = self.headers.get("x-model", "")
             if model:
                 st.record_model(model)
 
-            length = int(self.headers.get("Content-Length", "0") or "0")
+            length = int(self.headers.get("content-length", "0") or "0")
+            if length > MAX_BODY_BYTES or "transfer-encoding" in self.headers:
+                self.close_connection = True  # only a Content-Length body up to the cap is consumed
             if length > 0:
-                _ = self.rfile.read(min(length, 2 * 1024 * 1024))
-
-            # 模拟“巨大计算需求”：用 sleep 表示耗时推理（可通过 work_ms 调大）
-            time.sleep(work_ms / 1000.0)
-
-            inflight, total = st.snapshot()
-            resp = {
-                "ok": True,
-                "backend": st.backend_id,
-                "model": st.model,
-                "version": st.version,
-                "loaded": st.loaded,
-                "inflight": inflight,
-                "total": total,
-                "work_ms": work_ms,
-                "pid": os.getpid(),
-            }
-            self._json(200, resp)
+                await self._discard_body(min(length, MAX_BODY_BYTES))
+
+            # 模拟“巨大计算需求”：用 sleep 表示耗时推理（可通过 work_ms 调大）；
+            # asyncio.sleep 让成千上万个并发“推理”共用一个线程
+            await asyncio.sleep(work_ms / 1000.0)
+
+            self._send(200, st.infer_bytes(work_ms))
         finally:
             st.on_end()
 
-    def log_message(self, fmt, *args):
-        # quieter; uncomment for debugging
-        return
+    # path -> handler, one dict lookup per request instead of an if-chain.
+    _GET_ROUTES = {
+        "/health": _h_health,
+        "/hello": _h_hello,
+        "/ai/status": _h_status,
+        "/backend/info": _h_info,
+    }
+    _POST_ROUTES = {
+        "/infer": _h_infer,
+        "/infer_stream": _h_infer,
+    }
+
+    def do_GET(self):
+        h = self._GET_ROUTES.get(self.path.partition("?")[0])
+        if h is None:
+            self.writer.write(_NOT_FOUND_RESP_CLOSE if self.close_connection else _NOT_FOUND_RESP)
+            return
+        h(self)
+
+    async def do_POST(self):
+        path, _, query = self.path.partition("?")
+        h = self._POST_ROUTES.get(path)
+        if h is None:
+            if self._has_body():
+                self.close_connection = True
+            self.writer.write(_NOT_FOUND_RESP_CLOSE if self.close_connection else _NOT_FOUND_RESP)
+            return
+        await h(self, query)
 
 
 def main():
@@ -165,7 +337,16 @@ def main():
     ap.add_argument("--loaded", type=int, default=1)
     ap.add_argument("--capacity", type=int, default=8, help="higher => lower gpu_util under same load")
     ap.add_argument("--vram-total-mb", type=int, default=24576)
+    ap.add_argument(
+        "--uvloop",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="serve on uvloop (default: on when installed)",
+    )
     args = ap.parse_args()
+    if args.uvloop and uvloop is None:
+        ap.error("--uvloop requested but uvloop is not installed")
+    use_uvloop = uvloop is not None and args.uvloop is not False
 
     st = BackendState(
         backend_id=args.id,
@@ -176,10 +357,23 @@ def main():
         vram_total_mb=args.vram_total_mb,
     )
 
-    httpd = ThreadingHTTPServer((args.host, args.port), Handler)
-    httpd.state = st  # type: ignore[attr-defined]
-    print(f"[mock_ai_backend] listen http://{args.host}:{args.port} id={args.id} model={args.model}@{args.version} loaded={st.loaded}")
-    httpd.serve_forever()
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: Handler(st, r, w).handle(), args.host, args.port, limit=MAX_HEAD_BYTES
+        )
+        print(
+            f"[mock_ai_backend] listen http://{args.host}:{args.port} id={args.id} model={args.model}@{args.version} "
+            f"loaded={st.loaded} loop={'uvloop' if use_uvloop else 'asyncio'}"
+        )
+        async with server:
+            await server.serve_forever()
+
+    if use_uvloop:
+        uvloop.install()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":